@@ -0,0 +1,543 @@
+#!/usr/bin/env python
+"""
+AutoTest_Artifacts.py
+
+Content-addressed store for the files a test run leaves in the build
+directory (test inputs and outputs, the expected and updated data files,
+fuzzer and sanitizer reports). Each file is stored once per distinct
+content, compressed with zstd when the zstandard module is installed and
+gzip otherwise, and indexed in SQLite by submission, commit and test, so a
+semester of runs can be kept for grade disputes and queried quickly.
+
+    AutoTest_Artifacts.py add [--submission NAME] [--commit SHA] [FILE ...]
+    AutoTest_Artifacts.py list [--submission NAME] [--commit SHA] [--test TEST]
+    AutoTest_Artifacts.py cat HASH
+    AutoTest_Artifacts.py export --submission NAME DIR
+    AutoTest_Artifacts.py stats
+
+Author: Michelle Talley
+Copyright 2024 Michelle Talley University of Central Arkansas
+"""
+import sys
+import os
+import argparse
+import glob
+import gzip
+import hashlib
+import shutil
+import sqlite3
+import tempfile
+import time
+
+import AutoTest_OutputTest as autotest
+import AutoTest_Impact as impact
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip is used instead
+    zstandard = None
+
+
+#--------------------------------------------------------------------------
+# Global variables - modify as needed
+#--------------------------------------------------------------------------
+ARTIFACT_STORE = os.path.join(autotest.CACHE_DIR, 'artifacts')
+ARTIFACT_INDEX = 'index.sqlite'
+ZSTD_LEVEL = 10
+GZIP_LEVEL = 6
+# files are hashed, compressed and restored this many bytes at a time
+CHUNK_SIZE = 1 << 20
+
+# files collected from the build directory by 'add' when no files are given
+ARTIFACT_PATTERNS = ['test_input_*.txt',
+                     'test_output_*.txt',
+                     'test_main_*.txt',
+                     'movie_queue_*.txt',
+                     'movie_history_*.txt',
+                     'fuzz_repro.txt',
+                     f'{autotest.SANITIZER_LOG}.*']
+
+# artifacts whose test cannot be told from a _<command> suffix
+ARTIFACT_TESTS = {autotest.STUDENT_MAIN_MISSING_FILE: 'test_missing_file'}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS objects (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    codec TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    id INTEGER PRIMARY KEY,
+    submission TEXT NOT NULL,
+    commit_id TEXT NOT NULL DEFAULT '',
+    test TEXT NOT NULL DEFAULT '',
+    name TEXT NOT NULL,
+    hash TEXT NOT NULL REFERENCES objects (hash),
+    added REAL NOT NULL,
+    UNIQUE (submission, commit_id, test, name, hash)
+);
+CREATE INDEX IF NOT EXISTS artifacts_key ON artifacts (submission, commit_id, test);
+CREATE INDEX IF NOT EXISTS artifacts_hash ON artifacts (hash);
+'''
+
+
+#--------------------------------------------------------------------------
+# Store
+#--------------------------------------------------------------------------
+def connect(store):
+    """
+    Open the index of a store, creating the store if needed.
+
+    Args:
+        store (str): The store directory.
+
+    Returns:
+        sqlite3.Connection: The connection (autocommit mode).
+    """
+    os.makedirs(os.path.join(store, 'objects'), exist_ok=True)
+    conn = sqlite3.connect(os.path.join(store, ARTIFACT_INDEX), timeout=30,
+                           isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA busy_timeout = 30000')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def object_path(store, digest, codec):
+    """
+    Locate the file holding an object.
+
+    Args:
+        store (str): The store directory.
+        digest (str): The SHA-256 hash of the uncompressed content.
+        codec (str): 'zst' or 'gz'.
+
+    Returns:
+        str: The path of the object file.
+    """
+    return os.path.join(store, 'objects', digest[:2], f'{digest[2:]}.{codec}')
+
+
+def compress(src, dst, size):
+    """
+    Compress content with the best available codec, CHUNK_SIZE bytes at a
+    time.
+
+    Args:
+        src (file): The content, open for binary reading.
+        dst (file): The object file, open for binary writing.
+        size (int): The size of the content.
+
+    Returns:
+        str: The codec name.
+    """
+    if zstandard is not None:
+        zstandard.ZstdCompressor(level=ZSTD_LEVEL).copy_stream(
+            src, dst, size=size, read_size=CHUNK_SIZE, write_size=CHUNK_SIZE)
+        return 'zst'
+    with gzip.GzipFile(fileobj=dst, mode='wb', compresslevel=GZIP_LEVEL, mtime=0) as f:
+        shutil.copyfileobj(src, f, CHUNK_SIZE)
+    return 'gz'
+
+
+def decompress(codec, src, dst):
+    """
+    Decompress the content of an object, CHUNK_SIZE bytes at a time.
+
+    Args:
+        codec (str): The codec the object was stored with.
+        src (file): The object file, open for binary reading.
+        dst (file): Receives the content, open for binary writing.
+
+    Returns:
+        None
+    """
+    if codec == 'zst':
+        if zstandard is None:
+            raise RuntimeError('object is zstd compressed; install the zstandard module')
+        zstandard.ZstdDecompressor().copy_stream(src, dst, read_size=CHUNK_SIZE,
+                                                 write_size=CHUNK_SIZE)
+        return
+    with gzip.GzipFile(fileobj=src, mode='rb') as f:
+        shutil.copyfileobj(f, dst, CHUNK_SIZE)
+
+
+def put_object(conn, store, file):
+    """
+    Store the content of a file unless an identical object already exists.
+    The file is read in chunks, so it is never held in memory.
+
+    Args:
+        conn (sqlite3.Connection): The store index.
+        store (str): The store directory.
+        file (str): The file.
+
+    Returns:
+        tuple: (hash of the content, True if a new object was written)
+    """
+    with open(file, 'rb') as f:
+        sha = hashlib.sha256()
+        size = 0
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha.update(chunk)
+            size += len(chunk)
+        digest = sha.hexdigest()
+        if conn.execute('SELECT 1 FROM objects WHERE hash = ?', (digest,)).fetchone():
+            return digest, False
+        f.seek(0)
+        directory = os.path.dirname(object_path(store, digest, ''))
+        os.makedirs(directory, exist_ok=True)
+        # write then rename so a concurrent reader never sees a partial object
+        fd, tmp = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                codec = compress(f, out, size)
+            stored_size = os.path.getsize(tmp)
+            os.replace(tmp, object_path(store, digest, codec))
+        except BaseException:
+            os.remove(tmp)
+            raise
+    conn.execute('INSERT OR IGNORE INTO objects (hash, size, stored_size, codec) '
+                 'VALUES (?, ?, ?, ?)', (digest, size, stored_size, codec))
+    return digest, True
+
+
+def get_object(conn, store, prefix, dst):
+    """
+    Write the content of an object to a file.
+
+    Args:
+        conn (sqlite3.Connection): The store index.
+        store (str): The store directory.
+        prefix (str): The hash of the object, or an unambiguous prefix of it.
+        dst (file): Receives the content, open for binary writing.
+
+    Returns:
+        bool: False if no single object matches.
+    """
+    rows = conn.execute('SELECT hash, codec FROM objects WHERE hash LIKE ? LIMIT 2',
+                        (f'{prefix}%',)).fetchall()
+    if len(rows) != 1:
+        return False
+    with open(object_path(store, rows[0]['hash'], rows[0]['codec']), 'rb') as f:
+        decompress(rows[0]['codec'], f, dst)
+    return True
+
+
+def path_component(value):
+    """
+    Check that a submission, commit or file name is a single path component,
+    so that export cannot write outside its directory.
+
+    Args:
+        value (str): The name.
+
+    Returns:
+        bool: True if the name has no directory separators and is not . or ..
+    """
+    return value not in ('', '.', '..') and os.path.basename(value) == value and '/' not in value
+
+
+def artifact_test(name):
+    """
+    Work out which test produced an artifact from its file name, e.g.
+    test_output_watch.txt and movie_queue_watch.txt belong to test_watch.
+
+    Args:
+        name (str): The file name.
+
+    Returns:
+        str: The test name, or '' for files shared by the whole run.
+    """
+    if name in ARTIFACT_TESTS:
+        return ARTIFACT_TESTS[name]
+    stem = os.path.splitext(name)[0]
+    for cmd in autotest.USER_COMMANDS:
+        if stem.endswith(f'_{cmd}'):
+            return f'test_{cmd}'
+    return ''
+
+
+def add(conn, store, files, submission, commit):
+    """
+    Store files and index them under a submission and commit.
+
+    Args:
+        conn (sqlite3.Connection): The store index.
+        store (str): The store directory.
+        files (list): The files to store.
+        submission (str): The submission name.
+        commit (str): The commit the files were produced from ('' if unknown).
+
+    Returns:
+        tuple: (number of files indexed, number of new objects written)
+
+    Raises:
+        ValueError: If the submission or commit is not a single path component.
+    """
+    for value in (submission, commit):
+        if value and not path_component(value):
+            raise ValueError(f'{value!r} cannot be used as a directory name')
+    added = time.time()
+    new = 0
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        for file in files:
+            digest, written = put_object(conn, store, file)
+            new += written
+            name = os.path.basename(file)
+            conn.execute('INSERT OR IGNORE INTO artifacts '
+                         '(submission, commit_id, test, name, hash, added) '
+                         'VALUES (?, ?, ?, ?, ?, ?)',
+                         (submission, commit, artifact_test(name), name, digest, added))
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    return len(files), new
+
+
+def query(conn, args):
+    """
+    Find the artifacts matching the filters given on the command line.
+
+    Args:
+        conn (sqlite3.Connection): The store index.
+        args (argparse.Namespace): The command-line arguments (submission,
+            commit, test and name; submission and name may be glob patterns).
+
+    Returns:
+        list: The matching artifact rows joined with their objects, newest first.
+    """
+    where = []
+    params = []
+    if args.submission:
+        where.append('a.submission GLOB ?')
+        params.append(args.submission)
+    if args.commit:
+        where.append('a.commit_id LIKE ?')
+        params.append(f'{args.commit}%')
+    if args.test:
+        where.append('a.test = ?')
+        params.append(args.test)
+    if args.name:
+        where.append('a.name GLOB ?')
+        params.append(args.name)
+    sql = ('SELECT a.*, o.size, o.stored_size, o.codec FROM artifacts a '
+           'JOIN objects o ON o.hash = a.hash')
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += ' ORDER BY a.added DESC, a.submission, a.test, a.name'
+    return conn.execute(sql, params).fetchall()
+
+
+#--------------------------------------------------------------------------
+# Commands
+#--------------------------------------------------------------------------
+def add_command(conn, args):
+    """
+    Store the given files, or the run artifacts in the build directory.
+
+    Args:
+        conn (sqlite3.Connection): The store index.
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        int: 0 on success, 1 if there was nothing to store.
+    """
+    # the defaults are found from the build directory
+    files = [os.path.abspath(file) for file in args.files]
+    autotest.setup(args)
+    if not files:
+        files = sorted({file for pattern in ARTIFACT_PATTERNS for file in glob.glob(pattern)})
+    submission = args.submission or os.path.basename(os.path.abspath(autotest.PARENT_PROJECT))
+    commit = args.commit if args.commit is not None else (impact.student_commit() or '')
+    if not files:
+        autotest.report_failure('No artifacts to store')
+        return 1
+    try:
+        count, new = add(conn, args.store, files, submission, commit)
+    except ValueError as err:
+        autotest.report_failure(str(err))
+        return 1
+    if args.verbose:
+        autotest.report_info(f'Stored {count} artifacts for {submission} {commit[:12]} '
+                             f'({new} new objects)')
+    return 0
+
+
+def list_command(conn, args):
+    """
+    Print the artifacts matching the filters.
+
+    Args:
+        conn (sqlite3.Connection): The store index.
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        int: 0 if any artifact matched, 1 otherwise.
+    """
+    rows = query(conn, args)
+    for row in rows:
+        added = time.strftime('%Y-%m-%d %H:%M', time.localtime(row['added']))
+        print(f'{row["hash"][:12]}  {added}  {row["submission"]}  {row["commit_id"][:8] or "-":<8}  '
+              f'{row["test"] or "-":<17} {row["name"]} ({row["size"]} bytes)')
+    return 0 if rows else 1
+
+
+def cat_command(conn, args):
+    """
+    Write the content of an object to standard output.
+
+    Args:
+        conn (sqlite3.Connection): The store index.
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        int: 0 on success, 1 if the hash is unknown or ambiguous.
+    """
+    if not get_object(conn, args.store, args.hash, sys.stdout.buffer):
+        autotest.report_failure(f'No single object matches {args.hash}')
+        return 1
+    return 0
+
+
+def export_command(conn, args):
+    """
+    Restore the artifacts matching the filters as DIR/submission/commit/name.
+    When a file was stored more than once, the newest copy is kept. Entries
+    whose path would leave DIR are skipped.
+
+    Args:
+        conn (sqlite3.Connection): The store index.
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        int: 0 if any artifact was exported and none was skipped, 1 otherwise.
+    """
+    root = os.path.realpath(args.dir)
+    exported = set()
+    skipped = 0
+    for row in query(conn, args):
+        parts = [row['submission'], row['commit_id'] or 'unknown', row['name']]
+        path = os.path.realpath(os.path.join(root, *parts))
+        if not all(path_component(part) for part in parts) or \
+                os.path.commonpath([root, path]) != root:
+            autotest.report_failure(f'Skipping {"/".join(parts)}: outside {args.dir}')
+            skipped += 1
+            continue
+        if path in exported:
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            get_object(conn, args.store, row['hash'], f)
+        exported.add(path)
+    if args.verbose:
+        autotest.report_info(f'Exported {len(exported)} artifacts to {args.dir}')
+    return 0 if exported and not skipped else 1
+
+
+def stats_command(conn, args):
+    """
+    Print how much space deduplication and compression save.
+
+    Args:
+        conn (sqlite3.Connection): The store index.
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        int: 0
+    """
+    artifacts, logical, submissions = conn.execute(
+        'SELECT COUNT(*), COALESCE(SUM(o.size), 0), COUNT(DISTINCT a.submission) '
+        'FROM artifacts a JOIN objects o ON o.hash = a.hash').fetchone()
+    objects, unique, stored = conn.execute(
+        'SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) '
+        'FROM objects').fetchone()
+    autotest.report_info(f'Store:        {args.store}')
+    autotest.report_info(f'Submissions:  {submissions}')
+    autotest.report_info(f'Artifacts:    {artifacts} ({logical} bytes)')
+    autotest.report_info(f'Objects:      {objects} ({unique} bytes after deduplication)')
+    autotest.report_info(f'Stored:       {stored} bytes'
+                         + (f' ({stored / logical:.1%} of the original)' if logical else ''))
+    return 0
+
+
+def parse_arguments():
+    """
+    Parse command-line arguments.
+
+    Returns:
+        argparse.Namespace: The parsed command-line arguments.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--store", type=str, default=None,
+                        help="Store directory (default: AutoTest_cache/artifacts)")
+    parser.add_argument("-q", "--quiet", action="store_true", default=False,
+                        help="Enable quiet mode")
+    parser.add_argument("--debug", action="store_true", default=False,
+                        help="Enable debug mode")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    add_parser = subparsers.add_parser('add', help="Store run artifacts")
+    add_parser.add_argument("files", nargs='*',
+                            help="Files to store (default: the artifacts in the build directory)")
+    add_parser.add_argument("--submission", type=str, default=None,
+                            help="Submission name (default: the student directory name)")
+    add_parser.add_argument("--commit", type=str, default=None,
+                            help="Commit (default: HEAD of the student repository)")
+
+    for name, help_text in (('list', "List stored artifacts"),
+                            ('export', "Restore stored artifacts into a directory")):
+        query_parser = subparsers.add_parser(name, help=help_text)
+        query_parser.add_argument("--submission", type=str, default=None,
+                                  help="Submission name (glob pattern)")
+        query_parser.add_argument("--commit", type=str, default=None,
+                                  help="Commit (prefix)")
+        query_parser.add_argument("-t", "--test", type=str, default=None,
+                                  help="Test name")
+        query_parser.add_argument("--name", type=str, default=None,
+                                  help="File name (glob pattern)")
+        if name == 'export':
+            query_parser.add_argument("dir", help="Destination directory")
+
+    cat_parser = subparsers.add_parser('cat', help="Print a stored object")
+    cat_parser.add_argument("hash", help="Object hash (or unambiguous prefix)")
+
+    subparsers.add_parser('stats', help="Show storage statistics")
+    return parser.parse_args()
+
+
+def main():
+    """
+    Main entry point of the script.
+
+    Returns:
+        None
+    """
+    args = parse_arguments()
+    args.verbose = not args.quiet
+
+    if args.store is None:
+        # AutoTest_cache is found from the build directory
+        cwd = os.getcwd()
+        autotest.setup(args)
+        args.store = os.path.abspath(ARTIFACT_STORE)
+        os.chdir(cwd)
+    else:
+        args.store = os.path.abspath(args.store)
+    if args.command == 'export':
+        args.dir = os.path.abspath(args.dir)
+
+    conn = connect(args.store)
+    commands = {'add': add_command,
+                'list': list_command,
+                'cat': cat_command,
+                'export': export_command,
+                'stats': stats_command}
+    rc = commands[args.command](conn, args)
+    sys.exit(rc)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+"""
+AutoTest_Benchmark.py
+
+Benchmarks for the harness's own overhead. Each internal step of
+AutoTest_OutputTest.py (setup/cleanup, fixture copies, the shell spawn in
+execute_command, file_diff, the file_contains_* family and reporting) is timed
+in a scratch project that uses a trivial stand-in for the student's ./main,
+with the regular fixtures and with stress-sized ones. Results can be saved as
+a baseline and later runs compared against it; a slowdown beyond the
+tolerance makes the script exit with a non-zero code.
+
+    AutoTest_Benchmark.py [--save-baseline FILE] [--baseline FILE]
+
+Author: Michelle Talley
+Copyright 2024 Michelle Talley University of Central Arkansas
+"""
+import sys
+import os
+import shutil
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+
+import AutoTest_OutputTest as autotest
+
+
+#--------------------------------------------------------------------------
+# Global variables - modify as needed
+#--------------------------------------------------------------------------
+AUTOTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+SIZES = ['small', 'stress']
+STRESS_TITLES = 200000
+# searched for but found nowhere, so the search scans the whole file
+MISSING_TITLE = 'Not In Any Fixture: The Movie'
+MISSING_REGEX = r'Movie \d+: The Matrix'
+DEFAULT_REPEAT = 15
+DEFAULT_TOLERANCE = 0.25
+# differences below this many seconds are treated as noise
+MIN_DELTA = 0.0005
+
+# stand-in for the student program: echo the data files and save them unchanged
+STANDIN_MAIN = '''#!/bin/sh
+cat movie_queue.txt movie_history.txt
+cp movie_queue.txt movie_queue_updated.txt
+cp movie_history.txt movie_history_updated.txt
+'''
+
+
+#--------------------------------------------------------------------------
+# Helper functions
+#--------------------------------------------------------------------------
+@contextmanager
+def quiet():
+    """
+    Send everything written to file descriptors 1 and 2 (by Python or by
+    child processes) to /dev/null for the duration of a with block.
+
+    Yields:
+        None
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = [os.dup(1), os.dup(2)]
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(saved[0], 1)
+        os.dup2(saved[1], 2)
+        for fd in saved + [devnull]:
+            os.close(fd)
+
+
+def make_project(root, size):
+    """
+    Lay out a scratch project the way the grading environment does:
+    root/PROJECT holds the fixtures and root/PROJECT/BUILD the stand-in main.
+
+    Args:
+        root (str): The scratch directory (plays the student repository).
+        size (str): 'small' for the regular fixtures, 'stress' for generated
+            fixtures with STRESS_TITLES titles each.
+
+    Returns:
+        None
+    """
+    data_dir = os.path.join(root, autotest.PROJECT)
+    build_dir = os.path.join(root, autotest.TEST_DIR)
+    os.makedirs(build_dir)
+    for n, testfile in enumerate(autotest.TESTDATAFILES):
+        dest = os.path.join(data_dir, testfile)
+        if size == 'small':
+            shutil.copyfile(os.path.join(AUTOTEST_DIR, testfile), dest)
+        else:
+            # distinct titles per file, so a search cannot stop early in the wrong one
+            first = n * STRESS_TITLES
+            with open(dest, 'w', encoding='utf-8') as f:
+                f.writelines(f'Stress Test Movie {i}: The Sequel\n'
+                             for i in range(first, first + STRESS_TITLES))
+    main = os.path.join(build_dir, os.path.basename(autotest.EXECUTABLE))
+    with open(main, 'w', encoding='utf-8') as f:
+        f.write(STANDIN_MAIN)
+    os.chmod(main, 0o755)
+    return
+
+
+def benchmarks(args):
+    """
+    The steps to time. Each runs in the build directory of the scratch
+    project with the student data files in place.
+
+    Args:
+        args (argparse.Namespace): Arguments passed to the harness functions.
+
+    Returns:
+        dict: Maps step names to callables.
+    """
+    queue = autotest.STUDENT_MOVIE_QUEUE_FILE
+    history = autotest.STUDENT_MOVIE_HISTORY_FILE
+    output = 'bench_output.txt'
+    last_title = 'movie_last_title.txt'
+
+    def setup_cleanup():
+        autotest.cleanup(args)
+        autotest.setup(args)
+
+    def execute():
+        autotest.execute_command(f'{autotest.EXECUTABLE} > {output} 2>&1', args)
+
+    def contains_string():
+        # the last line of the output, then a title it does not contain
+        with open(last_title, 'r', encoding='utf-8') as f:
+            autotest.file_contains_string(output, f.read().strip(), args)
+        autotest.file_contains_string(output, MISSING_TITLE, args)
+
+    def report():
+        autotest.report_success('benchmark')
+        autotest.report_failure('benchmark')
+        autotest.banner('benchmark', args)
+        autotest.footer('benchmark', 0, args)
+
+    return {'setup_cleanup': setup_cleanup,
+            'copy_test_input_files': autotest.copy_test_input_files,
+            'file_copy': lambda: autotest.file_copy(queue, 'bench_copy.txt'),
+            'execute_command': execute,
+            'file_diff': lambda: autotest.file_diff(queue, autotest.STUDENT_MOVIE_QUEUE_UPDATE_FILE,
+                                                    args=args),
+            'file_contains_file': lambda: autotest.file_contains_file(output, history, args),
+            'file_contains_string': contains_string,
+            'file_contains_regex': lambda: autotest.file_contains_regex(output, MISSING_REGEX, args),
+            'report': report,
+            'test_watch': lambda: autotest.test_watch(args)}
+
+
+def measure(size, args):
+    """
+    Time every benchmark step for one fixture size.
+
+    Args:
+        size (str): The fixture size.
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        dict: Maps step names to {'median', 'min'} in seconds.
+    """
+    harness_args = argparse.Namespace(verbose=True, debug=False)
+    results = {}
+    cwd = os.getcwd()
+    root = tempfile.mkdtemp(prefix='autotest_bench_')
+    try:
+        make_project(root, size)
+        os.chdir(root)
+        with quiet():
+            autotest.setup(harness_args)
+            autotest.copy_test_input_files()
+            autotest.execute_command(f'{autotest.EXECUTABLE} > bench_output.txt 2>&1', harness_args)
+            # the stand-in prints the history last, so its last title ends the output
+            with open(autotest.STUDENT_MOVIE_HISTORY_FILE, 'r', encoding='utf-8') as f:
+                title = f.read().splitlines()[-1]
+            with open('movie_last_title.txt', 'w', encoding='utf-8') as f:
+                f.write(title)
+            for name, step in benchmarks(harness_args).items():
+                if args.step and name not in args.step:
+                    continue
+                times = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    step()
+                    times.append(time.perf_counter() - start)
+                results[name] = {'median': statistics.median(times), 'min': min(times)}
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Find steps that got slower than the baseline.
+
+    Args:
+        results (dict): {size: {step: {'median', 'min'}}} of this run.
+        baseline (dict): The same structure from the baseline run.
+        tolerance (float): Allowed relative slowdown of the median.
+
+    Returns:
+        list: (size, step, baseline median, current median) of each regression.
+    """
+    regressions = []
+    for size, steps in results.items():
+        for step, current in steps.items():
+            base = baseline.get(size, {}).get(step)
+            if base is None:
+                continue
+            if (current['median'] > base['median'] * (1 + tolerance) and
+                    current['median'] - base['median'] > MIN_DELTA):
+                regressions.append((size, step, base['median'], current['median']))
+    return regressions
+
+
+def print_results(results, baseline):
+    """
+    Print a table of the results, with the change from the baseline.
+
+    Args:
+        results (dict): {size: {step: {'median', 'min'}}}
+        baseline (dict): The baseline results (may be empty).
+
+    Returns:
+        None
+    """
+    for size, steps in results.items():
+        autotest.report_info(f'[==========] {size} fixtures', autotest.BLUE)
+        for step, current in steps.items():
+            line = (f'{step:<22} median {current["median"] * 1000:9.3f} ms   '
+                    f'min {current["min"] * 1000:9.3f} ms')
+            base = baseline.get(size, {}).get(step)
+            if base:
+                change = (current['median'] / base['median'] - 1) * 100 if base['median'] else 0.0
+                line += f'   {change:+6.1f}% vs baseline'
+            autotest.report_info(line)
+    return
+
+
+def parse_arguments():
+    """
+    Parse command-line arguments.
+
+    Returns:
+        argparse.Namespace: The parsed command-line arguments.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs='+', choices=SIZES, default=SIZES,
+                        help="Fixture sizes to benchmark")
+    parser.add_argument("-s", "--step", nargs='+', type=str, default=None,
+                        help="Only run these steps")
+    parser.add_argument("-r", "--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="Timed repetitions of each step")
+    parser.add_argument("--baseline", type=str, default=None,
+                        help="Compare against this baseline file")
+    parser.add_argument("--save-baseline", type=str, default=None,
+                        help="Save the results as a baseline file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed relative slowdown before a step counts as a regression")
+    return parser.parse_args()
+
+
+def main():
+    """
+    Main entry point of the script.
+
+    Returns:
+        None
+    """
+    args = parse_arguments()
+
+    results = {size: measure(size, args) for size in args.sizes}
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        autotest.report_info(f'Baseline saved to {args.save_baseline}')
+
+    rc = 0
+    regressions = compare(results, baseline, args.tolerance)
+    for size, step, base, current in regressions:
+        autotest.report_failure(f'{step} ({size}): {base * 1000:.3f} ms -> {current * 1000:.3f} ms')
+        rc = 1
+    if baseline and not regressions:
+        autotest.report_success(f'No step slower than baseline by more than {args.tolerance:.0%}')
+    sys.exit(rc)
+
+if __name__ == "__main__":
+    main()
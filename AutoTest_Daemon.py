@@ -0,0 +1,407 @@
+#!/usr/bin/env python
+"""
+AutoTest_Daemon.py
+
+Persistent grading service for the Stack Project. The server keeps the harness
+loaded, one incremental build tree per checkout (so googletest is only built
+once) and a warm sandbox pool per tree, and accepts "grade this checkout"
+requests on a Unix domain socket. Results are streamed back one test at a time
+as JSON lines. The client subcommand replaces AutoTest_all.sh as the entry
+point when a server is running.
+
+    AutoTest_Daemon.py serve [--socket PATH] [--workspace DIR]
+    AutoTest_Daemon.py grade [CHECKOUT] [--socket PATH] [-t TEST ...]
+
+Author: Michelle Talley
+Copyright 2024 Michelle Talley University of Central Arkansas
+"""
+import sys
+import os
+import subprocess
+import argparse
+import hashlib
+import json
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+import traceback
+
+import AutoTest_OutputTest as autotest
+import AutoTest_Impact as impact
+
+
+#--------------------------------------------------------------------------
+# Global variables - modify as needed
+#--------------------------------------------------------------------------
+AUTOTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SOCKET = os.path.join(os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir(),
+                              f'autotest-{os.getuid()}.sock')
+DEFAULT_WORKSPACE = os.path.join(tempfile.gettempdir(), f'autotest-daemon-{os.getuid()}')
+HARNESS_FILES = ['CMakeLists.txt', 'cpplint.cfg']
+# a failed configure leaves CMakeCache.txt behind; only these mean it succeeded
+GENERATED_BUILD_FILES = ['Makefile', 'build.ninja']
+POOL_SIZE = 2
+
+
+#--------------------------------------------------------------------------
+# Server
+#--------------------------------------------------------------------------
+class Grader:
+    """
+    The warm state shared by all grading requests: one build tree and one
+    sandbox pool per checkout. Requests are graded one at a time because the
+    harness changes the working directory.
+
+    Args:
+        workspace (str): Directory holding the build trees.
+        googletest (str, optional): A local googletest source tree, so build
+            trees do not download it.
+    """
+
+    def __init__(self, workspace, googletest=None):
+        self.workspace = workspace
+        self.googletest = googletest
+        self.pools = {}
+        self.lock = threading.Lock()
+        os.makedirs(workspace, exist_ok=True)
+
+    def tree(self, checkout):
+        """
+        Return the build tree for a checkout, creating it if needed.
+
+        Args:
+            checkout (str): The student checkout directory.
+
+        Returns:
+            str: The build tree directory.
+        """
+        key = hashlib.sha1(os.path.abspath(checkout).encode('utf-8')).hexdigest()[:12]
+        path = os.path.join(self.workspace, key)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def build(self, checkout, tree):
+        """
+        Bring a build tree up to date with the checkout and the harness and
+        build it incrementally.
+
+        Args:
+            checkout (str): The student checkout directory.
+            tree (str): The build tree directory.
+
+        Returns:
+            tuple: (return code, build output, True if anything changed)
+        """
+        changed = False
+        harness = [f for f in os.listdir(AUTOTEST_DIR) if f.startswith('AutoTest_')] + HARNESS_FILES
+        for name in harness:
+            if os.path.isfile(os.path.join(AUTOTEST_DIR, name)):
+                changed |= autotest.file_sync(os.path.join(AUTOTEST_DIR, name), os.path.join(tree, name))
+        for name in autotest.SOURCE_FILES:
+            src = os.path.join(checkout, name)
+            if not autotest.file_exists(src):
+                return 1, f'{src} not found\n', changed
+            changed |= autotest.file_sync(src, os.path.join(tree, name))
+
+        output = ''
+        build_dir = os.path.join(tree, autotest.BUILD)
+        if not any(autotest.file_exists(os.path.join(build_dir, name)) for name in GENERATED_BUILD_FILES):
+            cmd = ['cmake', '-S', tree, '-B', build_dir]
+            if self.googletest:
+                cmd.append(f'-DFETCHCONTENT_SOURCE_DIR_GOOGLETEST={self.googletest}')
+            proc = subprocess.run(cmd, capture_output=True, text=True, check=False)
+            output += proc.stdout + proc.stderr
+            if proc.returncode != 0:
+                return proc.returncode, output, changed
+        proc = subprocess.run(['cmake', '--build', build_dir, '--parallel'],
+                              capture_output=True, text=True, check=False)
+        return proc.returncode, output + proc.stdout + proc.stderr, changed
+
+    def pool(self, tree, rebuilt):
+        """
+        Return the warm sandbox pool of a build tree. The pool is recreated
+        when the harness or fixtures changed.
+
+        Args:
+            tree (str): The build tree directory.
+            rebuilt (bool): True if files in the tree changed.
+
+        Returns:
+            AutoTest_Sandbox.SandboxPool: The pool.
+        """
+        if rebuilt and tree in self.pools:
+            self.pools.pop(tree).close()
+        if tree not in self.pools:
+            self.pools[tree] = autotest.create_sandbox_pool(POOL_SIZE)
+        return self.pools[tree]
+
+    def grade(self, checkout, tests, send):
+        """
+        Build and test a checkout, sending one event per step.
+
+        Args:
+            checkout (str): The student checkout directory.
+            tests (list): Test names to run (STYLE_TEST for the coding
+                style check), or None for the style check and all tests.
+            send (callable): Called with each result event (a dict).
+
+        Returns:
+            int: 0 if the build and every test passed, otherwise the first
+                non-zero return code.
+        """
+        with self.lock:
+            tree = self.tree(checkout)
+            start = time.monotonic()
+            rc, output, changed = self.build(checkout, tree)
+            send({'event': 'build', 'rc': rc, 'output': output,
+                  'duration': time.monotonic() - start})
+            if rc != 0:
+                send({'event': 'done', 'rc': rc, 'passed': 0, 'failed': 0})
+                return rc
+
+            # the harness finds the data files through its DATA_DIR global
+            cwd = os.getcwd()
+            data_dir = autotest.DATA_DIR
+            os.chdir(os.path.join(tree, autotest.BUILD))
+            autotest.DATA_DIR = tree
+            args = argparse.Namespace(verbose=True, debug=False, quiet=False)
+            try:
+                pool = self.pool(tree, changed)
+                passed = failed = 0
+                first_rc = 0
+                for test in tests or [autotest.STYLE_TEST] + impact.all_tests():
+                    start = time.monotonic()
+                    if test == autotest.STYLE_TEST:
+                        test_rc, output = autotest.capture(autotest.run_style, args)
+                    elif test in autotest.TEST_CASES:
+                        test_rc, output = autotest.capture(autotest.run_test, test, args, pool)
+                    else:
+                        test_rc, output = autotest.capture(autotest.run_gtest, test, args)
+                    send({'event': 'test', 'name': test, 'rc': test_rc, 'output': output,
+                          'duration': time.monotonic() - start})
+                    passed += test_rc == 0
+                    failed += test_rc != 0
+                    if test_rc != 0 and first_rc == 0:
+                        first_rc = test_rc
+            finally:
+                os.chdir(cwd)
+                autotest.DATA_DIR = data_dir
+            send({'event': 'done', 'rc': first_rc, 'passed': passed, 'failed': failed})
+            return first_rc
+
+    def close(self):
+        """
+        Remove the sandbox pools.
+
+        Returns:
+            None
+        """
+        for pool in self.pools.values():
+            pool.close()
+        self.pools.clear()
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """
+    Handles one JSON request per connection and streams JSON line replies.
+    """
+
+    def handle(self):
+        def send(event):
+            self.wfile.write((json.dumps(event) + '\n').encode('utf-8'))
+            self.wfile.flush()
+
+        try:
+            request = json.loads(self.rfile.readline())
+        except ValueError as err:
+            send({'event': 'error', 'message': f'invalid request: {err}'})
+            return
+        action = request.get('action')
+        if action == 'grade':
+            try:
+                self.server.grader.grade(request['checkout'], request.get('tests'), send)
+            except Exception as err:
+                # log the failure and never leave the client waiting for 'done'
+                autotest.report_failure(f'grade {request.get("checkout")}: {err!r}')
+                traceback.print_exc()
+                try:
+                    send({'event': 'error', 'message': str(err)})
+                    send({'event': 'done', 'rc': 1, 'passed': 0, 'failed': 0})
+                except OSError:
+                    pass
+        elif action == 'ping':
+            send({'event': 'pong', 'pid': os.getpid()})
+        elif action == 'shutdown':
+            send({'event': 'bye'})
+            threading.Thread(target=self.server.shutdown).start()
+        else:
+            send({'event': 'error', 'message': f'unknown action: {action}'})
+
+
+class GradingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Unix domain socket server holding a Grader.
+    """
+    daemon_threads = True
+
+    def __init__(self, path, grader):
+        self.grader = grader
+        super().__init__(path, RequestHandler)
+
+
+def serve(args):
+    """
+    Run the grading server until it is asked to shut down.
+
+    Args:
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        int: 0 on a clean shutdown.
+    """
+    if os.path.exists(args.socket):
+        os.remove(args.socket)
+    grader = Grader(args.workspace, args.googletest)
+    with GradingServer(args.socket, grader) as server:
+        autotest.report_info(f'AutoTest daemon listening on {args.socket}', autotest.GREEN)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            grader.close()
+            os.remove(args.socket)
+    return 0
+
+
+#--------------------------------------------------------------------------
+# Client
+#--------------------------------------------------------------------------
+def request(path, message):
+    """
+    Send a request to the server and yield its replies.
+
+    Args:
+        path (str): The server socket.
+        message (dict): The request.
+
+    Yields:
+        dict: Each reply event.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall((json.dumps(message) + '\n').encode('utf-8'))
+        with sock.makefile('r', encoding='utf-8') as replies:
+            for line in replies:
+                yield json.loads(line)
+
+
+def grade(args):
+    """
+    Ask the server to grade a checkout and print the streamed results.
+
+    Args:
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        int: The return code reported by the server.
+    """
+    message = {'action': 'grade', 'checkout': os.path.abspath(args.checkout), 'tests': args.test}
+    try:
+        for event in request(args.socket, message):
+            kind = event['event']
+            if kind == 'build':
+                if event['rc'] != 0:
+                    print(event['output'])
+                    autotest.report_failure('Compile failed. Grade penalty to be assessed.')
+                elif args.verbose:
+                    autotest.report_success(f'Build up to date ({event["duration"]:.2f}s)')
+            elif kind == 'test':
+                if args.verbose:
+                    print(event['output'], end='')
+                elif event['rc'] != 0:
+                    autotest.report_failure(f'{event["name"]} rc: {event["rc"]}')
+            elif kind == 'done':
+                msg = f'{event["passed"]} passed, {event["failed"]} failed'
+                if event['rc'] == 0:
+                    autotest.report_success(msg)
+                else:
+                    autotest.report_failure(msg)
+                return event['rc']
+            elif kind == 'error':
+                autotest.report_failure(event['message'])
+                return 1
+    except OSError as err:
+        autotest.report_failure(f'Unable to reach AutoTest daemon at {args.socket}: {err}')
+    return 1
+
+
+def shutdown(args):
+    """
+    Ask the server to shut down.
+
+    Args:
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        int: 0 if the server acknowledged, 1 otherwise.
+    """
+    try:
+        for event in request(args.socket, {'action': 'shutdown'}):
+            return 0 if event['event'] == 'bye' else 1
+    except OSError as err:
+        autotest.report_failure(f'Unable to reach AutoTest daemon at {args.socket}: {err}')
+    return 1
+
+
+def parse_arguments():
+    """
+    Parse command-line arguments.
+
+    Returns:
+        argparse.Namespace: The parsed command-line arguments.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--socket", type=str, default=DEFAULT_SOCKET,
+                        help="Server socket path")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help="Run the grading server")
+    serve_parser.add_argument("--workspace", type=str, default=DEFAULT_WORKSPACE,
+                              help="Directory for the build trees")
+    serve_parser.add_argument("--googletest", type=str, default=None,
+                              help="Local googletest source tree (skips the download)")
+
+    grade_parser = subparsers.add_parser('grade', help="Grade a checkout")
+    grade_parser.add_argument("checkout", nargs='?', default='.',
+                              help="Student checkout directory (default: current directory)")
+    grade_parser.add_argument("-q", "--quiet", action="store_true", default=False,
+                              help="Only report failures and the summary")
+    grade_parser.add_argument("-t", "--test", nargs='+', type=str, default=None,
+                              help=f"Specify the test(s) to run ({autotest.STYLE_TEST}: the coding style check)")
+
+    subparsers.add_parser('shutdown', help="Stop the grading server")
+    return parser.parse_args()
+
+
+def main():
+    """
+    Main entry point of the script.
+
+    Returns:
+        None
+    """
+    args = parse_arguments()
+    if args.command == 'serve':
+        rc = serve(args)
+    elif args.command == 'grade':
+        args.verbose = not args.quiet
+        rc = grade(args)
+    else:
+        rc = shutdown(args)
+    sys.exit(rc)
+
+if __name__ == "__main__":
+    main()
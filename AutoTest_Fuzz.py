@@ -0,0 +1,463 @@
+#!/usr/bin/env python
+"""
+AutoTest_Fuzz.py
+
+Differential fuzzer for the Stack Project. Random command sequences (including
+invalid commands and commands against an empty queue) are run against the
+student program and against an in-process reference model of the movie queue.
+When the two diverge, the command sequence is shrunk with delta debugging to a
+minimal script that still reproduces the divergence.
+
+Author: Michelle Talley
+Copyright 2024 Michelle Talley University of Central Arkansas
+"""
+import sys
+import os
+import subprocess
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import AutoTest_OutputTest as autotest
+
+
+#--------------------------------------------------------------------------
+# Global variables - modify as needed
+#--------------------------------------------------------------------------
+INVALID_COMMANDS = ['z', 'y', 'k', '?']
+REPRO_FILE = 'fuzz_repro.txt'
+CRASH_RCS = [134, 139]
+
+# relative weights used when generating random commands
+COMMAND_WEIGHTS = {'add': 4,
+                   'watch': 3,
+                   'delete': 3,
+                   'history': 1,
+                   'recent': 1,
+                   'queue': 1,
+                   'next': 2,
+                   'invalid': 1
+                  }
+
+EXTRA_TITLES = [autotest.ADD_MOVIE,
+                'Blazing Saddles',
+                'Amélie',
+                'Crouching Tiger, Hidden Dragon',
+                "Schindler's List",
+                'Mission: Impossible - Dead Reckoning Part One',
+                'x',
+                '9']
+
+
+#--------------------------------------------------------------------------
+# Reference model
+#--------------------------------------------------------------------------
+def read_titles(file):
+    """
+    Read the movie titles from a data file.
+
+    Args:
+        file (str): The path to the data file.
+
+    Returns:
+        list: The titles in file order; an empty list if the file is missing.
+    """
+    if not autotest.file_exists(file):
+        return []
+    with open(file, 'r', encoding='utf-8') as f:
+        return [line.rstrip('\n') for line in f]
+
+
+def model_run(steps, queue, history):
+    """
+    Run a command sequence against the reference model of the movie queue.
+
+    Args:
+        steps (list): (command, title) pairs; title is None except for 'add'.
+        queue (list): The initial movie queue, front first.
+        history (list): The initial movie history, most recent first.
+
+    Returns:
+        tuple: (expected output lines, final queue, final history).
+            Commands whose output the assignment does not specify
+            (e.g. watching from an empty queue) contribute no lines.
+    """
+    queue = list(queue)
+    history = list(history)
+    expected = []
+    cmds = autotest.USER_COMMANDS
+    for cmd, title in steps:
+        if cmd == cmds['add']:
+            queue.append(title)
+        elif cmd == cmds['watch']:
+            if queue:
+                movie = queue.pop(0)
+                history.insert(0, movie)
+                expected.append(f'Watching: {movie}')
+        elif cmd == cmds['delete']:
+            if queue:
+                expected.append(f'Deleting: {queue.pop(0)}')
+        elif cmd == cmds['history']:
+            expected.append('Movie history:')
+            expected.extend(history)
+        elif cmd == cmds['recent']:
+            if history:
+                expected.append(f'Most recently watched movie: {history[0]}')
+        elif cmd == cmds['queue']:
+            expected.append('Movie queue:')
+            expected.extend(queue)
+        elif cmd == cmds['next']:
+            if queue:
+                expected.append(f'Next movie to watch: {queue[0]}')
+        else:
+            expected.append('Invalid command. Please try again.')
+    return expected, queue, history
+
+
+#--------------------------------------------------------------------------
+# Helper functions
+#--------------------------------------------------------------------------
+def normalize(lines):
+    """
+    Normalize lines the same way file_diff compares files: ignore case,
+    changes in white space and blank lines.
+
+    Args:
+        lines (list): The lines to normalize.
+
+    Returns:
+        list: The normalized, non-blank lines.
+    """
+    result = []
+    for line in lines:
+        line = ' '.join(line.split()).lower()
+        if line:
+            result.append(line)
+    return result
+
+
+def is_subsequence(needles, haystack):
+    """
+    Check that all needles appear in haystack in the same relative order.
+
+    Args:
+        needles (list): The lines that must appear.
+        haystack (list): The lines to search.
+
+    Returns:
+        bool: True if needles is an ordered subsequence of haystack.
+    """
+    it = iter(haystack)
+    return all(any(needle == line for line in it) for needle in needles)
+
+
+def steps_to_input(steps):
+    """
+    Convert a command sequence to the text piped to the program.
+
+    Args:
+        steps (list): (command, title) pairs.
+
+    Returns:
+        str: The program input, terminated by the exit command.
+    """
+    text = ''
+    for cmd, title in steps:
+        text += f'{cmd}\n'
+        if title is not None:
+            text += f'{title}\n'
+    return text + f'{autotest.USER_COMMANDS["exit"]}\n'
+
+
+def generate_steps(rng, titles, max_length):
+    """
+    Generate a random command sequence.
+
+    Args:
+        rng (random.Random): The random number generator.
+        titles (list): Candidate titles for the 'add' command.
+        max_length (int): The maximum number of commands.
+
+    Returns:
+        list: (command, title) pairs, not including the final exit.
+    """
+    names = list(COMMAND_WEIGHTS)
+    weights = list(COMMAND_WEIGHTS.values())
+    steps = []
+    for _ in range(rng.randint(1, max_length)):
+        name = rng.choices(names, weights)[0]
+        if name == 'invalid':
+            steps.append((rng.choice(INVALID_COMMANDS), None))
+        elif name == 'add':
+            steps.append((autotest.USER_COMMANDS['add'], rng.choice(titles)))
+        else:
+            steps.append((autotest.USER_COMMANDS[name], None))
+    return steps
+
+
+def run_student(pool, steps, empty, timeout):
+    """
+    Run a command sequence against the student program in a sandbox.
+
+    Args:
+        pool (AutoTest_Sandbox.SandboxPool): Sandboxes holding the data files
+            and a link to the student program.
+        steps (list): (command, title) pairs.
+        empty (list): Data files to truncate before the run.
+        timeout (float): Seconds to wait before the run counts as a hang.
+
+    Returns:
+        dict: 'rc', 'output', 'queue' and 'history' of the run; the file
+            entries are None if the program did not write them.
+    """
+    with pool.sandbox() as workdir:
+        for name in empty:
+            open(os.path.join(workdir, name), 'w', encoding='utf-8').close()
+        try:
+            proc = subprocess.run([os.path.join(workdir, os.path.basename(autotest.EXECUTABLE))],
+                                  cwd=workdir, timeout=timeout,
+                                  input=steps_to_input(steps).encode('utf-8'),
+                                  stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                  check=False)
+            rc = proc.returncode
+            output = proc.stdout.decode('utf-8', errors='replace').splitlines()
+        except subprocess.TimeoutExpired as err:
+            rc = None
+            output = (err.stdout or b'').decode('utf-8', errors='replace').splitlines()
+        result = {'rc': rc, 'output': output}
+        for key, name in (('queue', autotest.STUDENT_MOVIE_QUEUE_UPDATE_FILE),
+                          ('history', autotest.STUDENT_MOVIE_HISTORY_UPDATE_FILE)):
+            path = os.path.join(workdir, name)
+            result[key] = read_titles(path) if autotest.file_exists(path) else None
+        return result
+
+
+def check(pool, steps, fixture, args):
+    """
+    Run a command sequence against the student program and the reference
+    model and compare the results.
+
+    Args:
+        pool (AutoTest_Sandbox.SandboxPool): Sandboxes for the student program.
+        steps (list): (command, title) pairs.
+        fixture (dict): Maps student data file names to their contents.
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        tuple: (kind, detail) describing the first divergence found, or
+            None if the program agrees with the model.
+    """
+    queue = fixture[autotest.STUDENT_MOVIE_QUEUE_FILE]
+    history = fixture[autotest.STUDENT_MOVIE_HISTORY_FILE]
+    expected, queue, history = model_run(steps, queue, history)
+    empty = [name for name, lines in fixture.items() if not lines]
+    actual = run_student(pool, steps, empty, args.timeout)
+
+    rc = actual['rc']
+    if rc is None:
+        return ('timeout', f'no exit after {args.timeout} seconds')
+    if rc < 0 or rc in CRASH_RCS:
+        return ('crash', f'rc = {rc}')
+    if rc != 0:
+        return ('rc', f'rc = {rc}')
+    for key, model in (('queue', queue), ('history', history)):
+        if actual[key] is None:
+            return (key, f'movie {key} file not written')
+        if normalize(actual[key]) != normalize(model):
+            return (key, f'expected {model}, actual {actual[key]}')
+    if not args.state_only and not is_subsequence(normalize(expected),
+                                                  normalize(actual['output'])):
+        return ('output', f'expected lines {expected} in order')
+    return None
+
+
+def ddmin(steps, fails, executor):
+    """
+    Shrink a failing command sequence with the delta debugging algorithm.
+
+    Args:
+        steps (list): The failing command sequence.
+        fails (callable): Returns True if a candidate sequence still fails.
+        executor (concurrent.futures.Executor): Used to test candidates in
+            parallel.
+
+    Returns:
+        list: A 1-minimal failing command sequence.
+    """
+    n = 2
+    while len(steps) >= 2:
+        size = len(steps) // n
+        chunks = [steps[i:i + size] for i in range(0, len(steps), size)]
+        complements = [[step for j, chunk in enumerate(chunks) if j != i for step in chunk]
+                       for i in range(len(chunks))]
+        candidates = chunks + complements
+        results = list(executor.map(fails, candidates))
+        for i, failed in enumerate(results):
+            if failed:
+                steps = candidates[i]
+                n = 2 if i < len(chunks) else max(n - 1, 2)
+                break
+        else:
+            if n >= len(steps):
+                break
+            n = min(n * 2, len(steps))
+    return steps
+
+
+def report_divergence(steps, fixture, divergence):
+    """
+    Report a minimized divergence and save the reproducing input script.
+
+    Args:
+        steps (list): The minimized command sequence.
+        fixture (dict): Maps student data file names to their contents.
+        divergence (tuple): (kind, detail) of the divergence.
+
+    Returns:
+        None
+    """
+    script = steps_to_input(steps)
+    with open(REPRO_FILE, 'w', encoding='utf-8') as f:
+        f.write(script)
+    empty = [name for name, lines in fixture.items() if not lines]
+    autotest.report_failure(f'Divergence ({divergence[0]}): {divergence[1]}')
+    autotest.report_info(f'Minimal input ({len(steps)} commands, saved to {REPRO_FILE}):')
+    autotest.report_info(script, autotest.BLUE)
+    if empty:
+        autotest.report_info(f'Starting from empty: {", ".join(empty)}')
+    return
+
+
+#--------------------------------------------------------------------------
+# Fuzzer
+#--------------------------------------------------------------------------
+def fuzz(args):
+    """
+    Generate and check random command sequences until a divergence is found
+    or the iteration/time budget is exhausted.
+
+    Args:
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        int: 0 if no divergence was found, 1 otherwise.
+    """
+    executable = os.path.abspath(autotest.EXECUTABLE)
+    if not autotest.file_exists(executable):
+        autotest.report_failure(f'{executable} not found')
+        return 1
+
+    queue = read_titles(os.path.join(autotest.DATA_DIR, autotest.AUTOTEST_MOVIE_QUEUE_FILE))
+    history = read_titles(os.path.join(autotest.DATA_DIR, autotest.AUTOTEST_MOVIE_HISTORY_FILE))
+    titles = queue + history + EXTRA_TITLES
+
+    seed = args.seed if args.seed is not None else random.randrange(2**32)
+    rng = random.Random(seed)
+    if args.verbose:
+        autotest.report_info(f'Fuzzing {executable} with seed {seed} and {args.jobs} jobs')
+
+    def make_case():
+        steps = generate_steps(rng, titles, args.max_length)
+        fixture = {autotest.STUDENT_MOVIE_QUEUE_FILE: queue,
+                   autotest.STUDENT_MOVIE_HISTORY_FILE: history}
+        if rng.random() < args.empty_ratio:
+            fixture[autotest.STUDENT_MOVIE_QUEUE_FILE] = []
+        if rng.random() < args.empty_ratio:
+            fixture[autotest.STUDENT_MOVIE_HISTORY_FILE] = []
+        return steps, fixture
+
+    pool = autotest.create_sandbox_pool(args.jobs)
+    start = time.monotonic()
+    executions = 0
+    try:
+        with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+            while executions < args.iterations:
+                if args.time and time.monotonic() - start > args.time:
+                    break
+                batch = [make_case() for _ in range(min(args.jobs * 4, args.iterations - executions))]
+                results = list(executor.map(lambda case: check(pool, *case, args), batch))
+                executions += len(batch)
+                for (steps, fixture), divergence in zip(batch, results):
+                    if divergence is None:
+                        continue
+                    kind = divergence[0]
+                    if args.verbose:
+                        autotest.report_info(f'Divergence ({kind}) after {executions} executions; '
+                                             f'minimizing {len(steps)} commands')
+                    steps = ddmin(steps,
+                                  lambda candidate, fixture=fixture, kind=kind:
+                                  (check(pool, candidate, fixture, args) or ('',))[0] == kind,
+                                  executor)
+                    report_divergence(steps, fixture, check(pool, steps, fixture, args))
+                    return 1
+    finally:
+        pool.close()
+
+    elapsed = time.monotonic() - start
+    autotest.report_success(f'{executions} executions in {elapsed:.1f}s '
+                            f'({executions / max(elapsed, 1e-9) * 60:.0f}/min), no divergence')
+    return 0
+
+
+def parse_arguments():
+    """
+    Parse command-line arguments.
+
+    Returns:
+        argparse.Namespace: The parsed command-line arguments.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-v", "--verbose", action="store_true", default=True,
+                        help="Enable verbose output")
+    parser.add_argument("-q", "--quiet", action="store_true", default=False,
+                        help="Enable quiet mode")
+    parser.add_argument("--nosetup", action="store_true", default=False,
+                        help="Disable setup before running tests")
+    parser.add_argument("--nocleanup", action="store_true", default=False,
+                        help="Disable cleanup after running tests")
+    parser.add_argument("--debug", action="store_true", default=False,
+                        help="Enable debug mode")
+    parser.add_argument("-n", "--iterations", type=int, default=1000,
+                        help="Maximum number of command sequences to run")
+    parser.add_argument("--time", type=float, default=None,
+                        help="Stop after this many seconds")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Random seed (default: random)")
+    parser.add_argument("--max-length", type=int, default=30,
+                        help="Maximum number of commands per sequence")
+    parser.add_argument("--empty-ratio", type=float, default=0.2,
+                        help="Probability of starting from an empty queue/history file")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Number of program executions to run in parallel")
+    parser.add_argument("--timeout", type=float, default=5.0,
+                        help="Seconds before a program run counts as a hang")
+    parser.add_argument("--state-only", action="store_true", default=False,
+                        help="Only compare exit status and saved files, not output")
+    return parser.parse_args()
+
+
+def main():
+    """
+    Main entry point of the script.
+
+    Returns:
+        None
+    """
+    args = parse_arguments()
+
+    if args.quiet:
+        args.verbose = False
+
+    if not args.nosetup:
+        autotest.setup(args)
+
+    rc = fuzz(args)
+
+    if not args.nocleanup:
+        autotest.cleanup(args)
+
+    sys.exit(rc)
+
+if __name__ == "__main__":
+    main()
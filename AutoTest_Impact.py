@@ -0,0 +1,355 @@
+#!/usr/bin/env python
+"""
+AutoTest_Impact.py
+
+Test-impact selection for the Stack Project. Each test is mapped to the source
+files it depends on. The hashes of those files are compared against the ones
+recorded when the test last ran, only the tests affected by a change are run
+again, and the cached verdicts are reused for the rest.
+
+Impact selection does not build anything: copy and rebuild the sources with
+AutoTest_setup.sh (or keep AutoTest_Watch.py running) first. Tests whose
+executable is older than its sources are not run.
+
+Author: Michelle Talley
+Copyright 2024 Michelle Talley University of Central Arkansas
+"""
+import sys
+import os
+import subprocess
+import argparse
+import fnmatch
+import hashlib
+import json
+import re
+
+import AutoTest_OutputTest as autotest
+
+
+#--------------------------------------------------------------------------
+# Test dependencies - modify as needed
+#    Patterns are matched against output test names (TEST_CASES) and
+#    googletest names (Suite.Test); files are relative to DATA_DIR.
+#--------------------------------------------------------------------------
+TEST_DEPENDENCIES = {'StackTest.*': ['Stack.h', autotest.GTEST_SOURCE_FILE],
+                     'QueueTest.*': ['Queue.h', autotest.GTEST_SOURCE_FILE],
+                     'test_*': autotest.SOURCE_FILES + autotest.TESTDATAFILES +
+                               ['AutoTest_OutputTest.py']
+                    }
+
+IMPACT_CACHE_FILE = os.path.join(autotest.CACHE_DIR, 'impact.json')
+
+# the executables the tests run and the sources (in DATA_DIR) they are built from
+EXECUTABLE_SOURCES = {autotest.EXECUTABLE: autotest.SOURCE_FILES,
+                      autotest.GTEST_EXECUTABLE: [file for file in autotest.SOURCE_FILES
+                                                  if file.endswith('.h')] +
+                                                 [autotest.GTEST_SOURCE_FILE]}
+
+
+#--------------------------------------------------------------------------
+# Helper functions
+#--------------------------------------------------------------------------
+def gtest_cases(source=None):
+    """
+    List the googletest cases defined in the googletest source file.
+
+    Args:
+        source (str, optional): The googletest source file. Defaults to
+            GTEST_SOURCE_FILE in DATA_DIR.
+
+    Returns:
+        list: Test names in the form Suite.Test, in source order.
+    """
+    if source is None:
+        source = os.path.join(autotest.DATA_DIR, autotest.GTEST_SOURCE_FILE)
+    with open(source, 'r', encoding='utf-8') as f:
+        return [f'{suite}.{name}'
+                for suite, name in re.findall(r'^TEST\(\s*(\w+)\s*,\s*(\w+)\s*\)',
+                                              f.read(), re.MULTILINE)]
+
+
+def all_tests():
+    """
+    List every output test and googletest case.
+
+    Returns:
+        list: The test names.
+    """
+    return autotest.TEST_CASES + gtest_cases()
+
+
+def dependencies(test):
+    """
+    Look up the files a test depends on.
+
+    Args:
+        test (str): The test name.
+
+    Returns:
+        list: File names relative to DATA_DIR. Unknown tests depend on all
+            source files.
+    """
+    for pattern, files in TEST_DEPENDENCIES.items():
+        if fnmatch.fnmatchcase(test, pattern):
+            return files
+    return autotest.SOURCE_FILES
+
+
+def file_hash(file):
+    """
+    Compute the SHA-256 hash of a file.
+
+    Args:
+        file (str): The path to the file.
+
+    Returns:
+        str: The hex digest, or None if the file does not exist.
+    """
+    if not autotest.file_exists(file):
+        return None
+    digest = hashlib.sha256()
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_hashes(tests):
+    """
+    Hash every file the given tests depend on.
+
+    Args:
+        tests (list): The test names.
+
+    Returns:
+        dict: Maps file names to their hashes.
+    """
+    files = sorted({file for test in tests for file in dependencies(test)})
+    return {file: file_hash(os.path.join(autotest.DATA_DIR, file)) for file in files}
+
+
+def stale_executables(tests):
+    """
+    Find the executables of the given tests that are missing or older than
+    a source they are built from.
+
+    Args:
+        tests (list): The test names.
+
+    Returns:
+        list: The stale executables.
+    """
+    executables = {autotest.EXECUTABLE if test in autotest.TEST_CASES else autotest.GTEST_EXECUTABLE
+                   for test in tests}
+    stale = []
+    for executable in sorted(executables):
+        if not autotest.file_exists(executable):
+            stale.append(executable)
+            continue
+        built = os.path.getmtime(executable)
+        sources = [os.path.join(autotest.DATA_DIR, file) for file in EXECUTABLE_SOURCES[executable]]
+        if any(os.path.getmtime(file) > built for file in sources if autotest.file_exists(file)):
+            stale.append(executable)
+    return stale
+
+
+def student_commit():
+    """
+    Identify the commit being graded.
+
+    Returns:
+        str: The commit hash of the student repository, or None.
+    """
+    try:
+        return subprocess.run(['git', '-C', autotest.PARENT_PROJECT, 'rev-parse', 'HEAD'],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_cache(file):
+    """
+    Load the verdicts and dependency hashes recorded by previous runs.
+
+    Args:
+        file (str): The path to the cache file.
+
+    Returns:
+        dict: The cache. 'tests' maps each test to its last verdict ('rc')
+            and the hashes of its dependencies when it ran ('hashes').
+    """
+    try:
+        with open(file, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    return {'tests': cache.get('tests', {}) if isinstance(cache, dict) else {}}
+
+
+def save_cache(file, cache):
+    """
+    Save the verdicts and dependency hashes.
+
+    Args:
+        file (str): The path to the cache file.
+        cache (dict): The cache to save.
+
+    Returns:
+        None
+    """
+    os.makedirs(os.path.dirname(file), exist_ok=True)
+    with open(file, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2)
+    return
+
+
+def select_tests(tests, hashes, cache):
+    """
+    Split tests into those affected by a changed dependency and those whose
+    cached verdict can be reused.
+
+    Args:
+        tests (list): The candidate test names.
+        hashes (dict): The current hashes of the dependencies.
+        cache (dict): The cache from previous runs.
+
+    Returns:
+        tuple: (affected tests, reused tests)
+    """
+    affected = []
+    reused = []
+    for test in tests:
+        entry = cache['tests'].get(test)
+        # a test is compared against the hashes from when it last ran, so
+        # running a subset (-t) cannot hide a change from the other tests
+        if entry is None or any(entry['hashes'].get(file) != hashes[file]
+                                for file in dependencies(test)):
+            affected.append(test)
+        else:
+            reused.append(test)
+    return affected, reused
+
+
+def run_any(test, args):
+    """
+    Run an output test or a googletest case.
+
+    Args:
+        test (str): The test name.
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        int: The return code of the test.
+    """
+    if test in autotest.TEST_CASES:
+        return autotest.run_test(test, args)
+    return autotest.run_gtest(test, args)
+
+
+def impact(args):
+    """
+    Run the tests affected by source changes since the previous run.
+
+    Args:
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        int: 0 if every selected and reused test passed, 1 otherwise (also
+            when an affected test's executable needs rebuilding).
+    """
+    tests = args.test if args.test else all_tests()
+    hashes = source_hashes(tests)
+    cache = load_cache(args.cache)
+    if args.force:
+        affected, reused = list(tests), []
+    else:
+        affected, reused = select_tests(tests, hashes, cache)
+
+    if args.verbose:
+        autotest.report_info(f'Affected tests ({len(affected)}): {" ".join(affected)}')
+        autotest.report_info(f'Reused verdicts ({len(reused)}): {" ".join(reused)}')
+    if args.dry_run:
+        return 0
+
+    # the tests would run the old code and cache its verdicts as current
+    stale = stale_executables(affected)
+    if stale and not args.debug:
+        autotest.report_failure(f'{" ".join(stale)} older than its sources; rebuild first '
+                                '(AutoTest_setup.sh or cmake --build)')
+        return 1
+
+    verdicts = {test: cache['tests'][test]['rc'] for test in reused}
+    for test in affected:
+        verdicts[test] = run_any(test, args)
+        # nothing runs in debug mode, so there is no verdict to keep
+        if not args.debug:
+            cache['tests'][test] = {'rc': verdicts[test],
+                                    'hashes': {file: hashes[file] for file in dependencies(test)}}
+    if not args.debug:
+        save_cache(args.cache, cache)
+
+    failed = [test for test in tests if verdicts[test] != 0]
+    for test in reused:
+        rc = verdicts[test]
+        if args.verbose:
+            autotest.report_info(f'[  CACHED  ] {test} rc: {rc}', autotest.RED if rc else autotest.GREEN)
+    if failed:
+        autotest.report_failure(f'{len(failed)} of {len(tests)} tests failed: {" ".join(failed)}')
+        return 1
+    autotest.report_success(f'{len(tests)} tests passed ({len(affected)} run, {len(reused)} cached)')
+    return 0
+
+
+def parse_arguments():
+    """
+    Parse command-line arguments.
+
+    Returns:
+        argparse.Namespace: The parsed command-line arguments.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-v", "--verbose", action="store_true", default=True,
+                        help="Enable verbose output")
+    parser.add_argument("-q", "--quiet", action="store_true", default=False,
+                        help="Enable quiet mode")
+    parser.add_argument("--nosetup", action="store_true", default=False,
+                        help="Disable setup before running tests")
+    parser.add_argument("--nocleanup", action="store_true", default=False,
+                        help="Disable cleanup after running tests")
+    parser.add_argument("--debug", action="store_true", default=False,
+                        help="Enable debug mode")
+    parser.add_argument("-t", "--test", nargs='+', type=str, default=None,
+                        help="Restrict selection to these tests (output tests or Suite.Test)")
+    parser.add_argument("--force", action="store_true", default=False,
+                        help="Run every test and refresh the cache")
+    parser.add_argument("--dry-run", action="store_true", default=False,
+                        help="Only report which tests would run")
+    parser.add_argument("--cache", type=str, default=IMPACT_CACHE_FILE,
+                        help="Cache file (relative to the build directory)")
+    return parser.parse_args()
+
+
+def main():
+    """
+    Main entry point of the script.
+
+    Returns:
+        None
+    """
+    args = parse_arguments()
+
+    if args.quiet:
+        args.verbose = False
+
+    if not args.nosetup:
+        autotest.setup(args)
+
+    rc = impact(args)
+
+    if not args.nocleanup:
+        autotest.cleanup(args)
+
+    sys.exit(rc)
+
+if __name__ == "__main__":
+    main()
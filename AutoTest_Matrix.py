@@ -0,0 +1,471 @@
+#!/usr/bin/env python
+"""
+AutoTest_Matrix.py
+
+Fixture matrix for the Stack Project. Every user command scenario is crossed
+with generated fixture variants (empty files, a single entry, titles with
+punctuation or Unicode, very long titles and missing files) instead of only
+the AutoTest_movie_queue.txt/AutoTest_movie_history.txt pair and ADD_MOVIE.
+All scenarios of a fixture run in one ./main session and are checked against
+the reference model of AutoTest_Fuzz.py; the fixtures run in parallel.
+Only when a session crashes, hangs or saves the wrong files is it rerun on
+shorter prefixes to find the scenario responsible.
+
+    AutoTest_Matrix.py [-f FIXTURE ...] [-j JOBS] [--report FILE]
+
+Author: Michelle Talley
+Copyright 2024 Michelle Talley University of Central Arkansas
+"""
+import sys
+import os
+import argparse
+import json
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import AutoTest_OutputTest as autotest
+import AutoTest_Sandbox
+import AutoTest_Fuzz as fuzz
+
+
+#--------------------------------------------------------------------------
+# Global variables - modify as needed
+#--------------------------------------------------------------------------
+# the order the scenarios run in within a session; 'exit' (saving the data
+# files) always comes last
+SCENARIOS = ['recent', 'next', 'watch', 'history', 'delete', 'add', 'queue', 'invalid', 'exit']
+
+# failures that end the session: the scenarios after them never ran
+ABNORMAL_EXITS = ['crash', 'timeout', 'rc']
+
+LONG_TITLE_LENGTH = 4096
+
+PUNCTUATION_TITLES = ["Schindler's List",
+                      'Mission: Impossible - Dead Reckoning Part One',
+                      'Crouching Tiger, Hidden Dragon',
+                      'Who Framed Roger Rabbit?',
+                      '(500) Days of Summer',
+                      'Se7en',
+                      '8 1/2',
+                      '"Crocodile" Dundee']
+
+UNICODE_TITLES = ['Amélie',
+                  '千と千尋の神隠し',
+                  'Léon: The Professional',
+                  'Das Boot – Director’s Cut',
+                  'Ōkami 🐺',
+                  'Крылья']
+
+
+def long_title(name):
+    """
+    Make a title of LONG_TITLE_LENGTH characters.
+
+    Args:
+        name (str): Text that makes the title unique.
+
+    Returns:
+        str: The title.
+    """
+    return (f'{name} ' * LONG_TITLE_LENGTH)[:LONG_TITLE_LENGTH].rstrip()
+
+
+def make_fixtures():
+    """
+    Generate the fixture variants from the AutoTest data files.
+
+    Returns:
+        dict: Maps fixture names to dicts with the initial 'queue' and
+            'history' (None for a missing file) and the title to 'add'.
+    """
+    queue = fuzz.read_titles(os.path.join(autotest.DATA_DIR, autotest.AUTOTEST_MOVIE_QUEUE_FILE))
+    history = fuzz.read_titles(os.path.join(autotest.DATA_DIR, autotest.AUTOTEST_MOVIE_HISTORY_FILE))
+    add = autotest.ADD_MOVIE
+    return {'autotest': {'queue': queue, 'history': history, 'add': add},
+            'empty': {'queue': [], 'history': [], 'add': add},
+            'empty_queue': {'queue': [], 'history': history, 'add': add},
+            'empty_history': {'queue': queue, 'history': [], 'add': add},
+            'single': {'queue': queue[:1], 'history': history[:1], 'add': add},
+            'punctuation': {'queue': PUNCTUATION_TITLES[:4], 'history': PUNCTUATION_TITLES[4:],
+                            'add': 'Dr. Strangelove or: How I Learned to Stop Worrying and Love the Bomb'},
+            'unicode': {'queue': UNICODE_TITLES[:3], 'history': UNICODE_TITLES[3:],
+                        'add': 'Tiger & Dragon (臥虎藏龍)'},
+            'long': {'queue': [long_title('Queue'), long_title('Next')],
+                     'history': [long_title('History')], 'add': long_title('Added')},
+            'missing_queue': {'queue': None, 'history': history, 'add': add},
+            'missing_history': {'queue': queue, 'history': None, 'add': add},
+            'missing_both': {'queue': None, 'history': None, 'add': add},
+           }
+
+
+def scenario_steps(scenario, fixture):
+    """
+    Convert a scenario to the commands it sends.
+
+    Args:
+        scenario (str): The scenario name.
+        fixture (dict): The fixture the scenario runs against.
+
+    Returns:
+        list: (command, title) pairs; empty for 'exit', which every session
+            ends with.
+    """
+    if scenario == 'exit':
+        return []
+    if scenario == 'invalid':
+        return [(fuzz.INVALID_COMMANDS[0], None)]
+    if scenario == 'add':
+        return [(autotest.USER_COMMANDS['add'], fixture['add'])]
+    return [(autotest.USER_COMMANDS[scenario], None)]
+
+
+def expectations(scenarios, fixture):
+    """
+    Derive what each scenario of a session must print, and the files the
+    session must save, from the reference model.
+
+    Args:
+        scenarios (list): The scenario names, in session order.
+        fixture (dict): The fixture the session runs against.
+
+    Returns:
+        tuple: (list of normalized expected lines per scenario, final queue,
+            final history). With a missing data file the program only has to
+            report the missing file (as in test_missing_file), so the final
+            queue and history are None and only the first scenario has
+            expected lines: the AUTOTEST_MAIN_MISSING_FILE text. Scenarios
+            whose output cannot be checked (all of them if that file does not
+            exist) have None instead of a list.
+    """
+    if fixture['queue'] is None or fixture['history'] is None:
+        expected = [None for _ in scenarios]
+        message = os.path.join(autotest.DATA_DIR, autotest.AUTOTEST_MAIN_MISSING_FILE)
+        if scenarios and autotest.file_exists(message):
+            expected[0] = fuzz.normalize(fuzz.read_titles(message))
+        return expected, None, None
+    queue, history = fixture['queue'], fixture['history']
+    expected = []
+    for scenario in scenarios:
+        lines, queue, history = fuzz.model_run(scenario_steps(scenario, fixture), queue, history)
+        expected.append(fuzz.normalize(lines))
+    return expected, queue, history
+
+
+#--------------------------------------------------------------------------
+# Sessions
+#--------------------------------------------------------------------------
+def create_pool(name, fixture, directory):
+    """
+    Write the data files of a fixture and create a sandbox for it.
+
+    Args:
+        name (str): The fixture name.
+        fixture (dict): The fixture.
+        directory (str): Where to write the data files.
+
+    Returns:
+        AutoTest_Sandbox.SandboxPool: A pool of one sandbox holding the data
+            files (a missing file is left out) and a link to the executable.
+    """
+    files = {}
+    for key, file in (('queue', autotest.STUDENT_MOVIE_QUEUE_FILE),
+                      ('history', autotest.STUDENT_MOVIE_HISTORY_FILE)):
+        if fixture[key] is None:
+            continue
+        files[file] = os.path.join(directory, f'{name}_{file}')
+        with open(files[file], 'w', encoding='utf-8') as f:
+            f.writelines(f'{title}\n' for title in fixture[key])
+    links = {os.path.basename(autotest.EXECUTABLE): os.path.abspath(autotest.EXECUTABLE)}
+    return AutoTest_Sandbox.SandboxPool(1, files, links)
+
+
+def run_session(pool, fixture, scenarios, args):
+    """
+    Run scenarios in one session of the student program and check the exit
+    status and the saved data files.
+
+    Args:
+        pool (AutoTest_Sandbox.SandboxPool): The fixture's sandbox.
+        fixture (dict): The fixture.
+        scenarios (list): The scenario names, in session order.
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        tuple: (result of AutoTest_Fuzz.run_student, (kind, detail) of the
+            failure, or None if the session exited normally and saved the
+            files the model expects).
+    """
+    steps = [step for scenario in scenarios for step in scenario_steps(scenario, fixture)]
+    actual = fuzz.run_student(pool, steps, [], args.timeout)
+    _, queue, history = expectations(scenarios, fixture)
+
+    rc = actual['rc']
+    if rc is None:
+        return actual, ('timeout', f'no exit after {args.timeout} seconds')
+    if rc < 0 or rc in fuzz.CRASH_RCS:
+        return actual, ('crash', f'rc = {rc}')
+    if queue is None:
+        return actual, None
+    if rc != 0:
+        return actual, ('rc', f'rc = {rc}')
+    for key, model in (('queue', queue), ('history', history)):
+        if actual[key] is None:
+            return actual, (key, f'movie {key} file not written')
+        if fuzz.normalize(actual[key]) != fuzz.normalize(model):
+            return actual, (key, f'expected {model}, actual {actual[key]}')
+    return actual, None
+
+
+def isolate(pool, fixture, scenarios, divergence, args):
+    """
+    Find the first scenario of a failing session that fails on its own, by
+    bisecting over session prefixes (each ending with the exit command).
+
+    Args:
+        pool (AutoTest_Sandbox.SandboxPool): The fixture's sandbox.
+        fixture (dict): The fixture.
+        scenarios (list): The scenario names, ending with 'exit'.
+        divergence (tuple): (kind, detail) of the failure of the whole session.
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        tuple: (index of the scenario, (kind, detail) of its failure, number
+            of sessions run).
+    """
+    body = scenarios[:-1]
+    lo, hi = 0, len(body)
+    sessions = 0
+    # invariant: the prefix of length hi fails; find the shortest one that does
+    while lo < hi:
+        mid = (lo + hi) // 2
+        _, failure = run_session(pool, fixture, body[:mid] + ['exit'], args)
+        sessions += 1
+        if failure is None:
+            lo = mid + 1
+        else:
+            hi, divergence = mid, failure
+    # the prefix of length 0 is just the exit command
+    return (hi - 1 if hi else len(scenarios) - 1), divergence, sessions
+
+
+def match_from(needles, haystack, start):
+    """
+    Find needles in haystack in order, starting at a position.
+
+    Args:
+        needles (list): The lines that must appear.
+        haystack (list): The lines to search.
+        start (int): The position to start searching at.
+
+    Returns:
+        int: The position after the last needle, or None if they do not all
+            appear.
+    """
+    pos = start
+    for needle in needles:
+        while pos < len(haystack) and haystack[pos] != needle:
+            pos += 1
+        if pos == len(haystack):
+            return None
+        pos += 1
+    return pos
+
+
+def run_fixture(name, fixture, directory, args):
+    """
+    Run every scenario against a fixture in one session and give each
+    scenario a verdict.
+
+    Args:
+        name (str): The fixture name.
+        fixture (dict): The fixture.
+        directory (str): Where to write the fixture's data files.
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        dict: 'cells' maps each scenario to (verdict, detail), where the
+            verdict is 'ok', 'fail', 'skipped' (not reached because the
+            program crashed, hung or exited earlier) or 'unchecked' (ran, but
+            nothing is known about its expected output); 'sessions' is the
+            number of sessions run.
+    """
+    pool = create_pool(name, fixture, directory)
+    try:
+        with autotest.trace_span(name, cat='fixture'):
+            actual, divergence = run_session(pool, fixture, SCENARIOS, args)
+            sessions = 1
+            cells = {}
+            stop = len(SCENARIOS)
+            if divergence is not None:
+                index, divergence, runs = isolate(pool, fixture, SCENARIOS, divergence, args)
+                sessions += runs
+                cells[SCENARIOS[index]] = ('fail', f'{divergence[0]}: {divergence[1]}')
+                if divergence[0] in ABNORMAL_EXITS:
+                    stop = index
+
+            # every scenario's expected lines must follow the previous scenario's
+            expected, _, _ = expectations(SCENARIOS, fixture)
+            output = [] if args.state_only else fuzz.normalize(actual['output'])
+            pos = 0
+            for index, scenario in enumerate(SCENARIOS):
+                if index > stop:
+                    cells[scenario] = ('skipped', '')
+                elif scenario in cells:
+                    continue
+                elif expected[index] is None:
+                    cells[scenario] = ('unchecked', '')
+                elif args.state_only:
+                    cells[scenario] = ('ok', '')
+                else:
+                    end = match_from(expected[index], output, pos)
+                    if end is None:
+                        cells[scenario] = ('fail', f'output: expected lines {expected[index]} in order')
+                    else:
+                        cells[scenario] = ('ok', '')
+                        pos = end
+    finally:
+        pool.close()
+    return {'cells': cells, 'sessions': sessions}
+
+
+#--------------------------------------------------------------------------
+# Matrix
+#--------------------------------------------------------------------------
+def print_matrix(results):
+    """
+    Print the verdicts as a fixture by scenario table, then the details of
+    the failures.
+
+    Args:
+        results (dict): Maps fixture names to the results of run_fixture.
+
+    Returns:
+        None
+    """
+    width = max(len(name) for name in results)
+    symbols = {'ok': ('ok', autotest.GREEN), 'fail': ('FAIL', autotest.RED),
+               'skipped': ('-', autotest.RESET), 'unchecked': ('?', autotest.BLUE)}
+    autotest.report_info(f'{"":<{width}}' + ''.join(f' {s:>8}' for s in SCENARIOS), autotest.BLUE)
+    for name, result in results.items():
+        row = f'{name:<{width}}'
+        for scenario in SCENARIOS:
+            text, color = symbols[result['cells'][scenario][0]]
+            row += f' {color}{text:>8}{autotest.RESET}'
+        print(row)
+    for name, result in results.items():
+        for scenario in SCENARIOS:
+            verdict, detail = result['cells'][scenario]
+            if verdict == 'fail':
+                if len(detail) > 300:
+                    detail = detail[:300] + '...'
+                autotest.report_failure(f'{name} / {scenario}: {detail}')
+    return
+
+
+def matrix(args):
+    """
+    Run the fixture matrix, one session per fixture with the fixtures in
+    parallel, and report the verdicts.
+
+    Args:
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        int: 0 if no cell failed, 1 otherwise.
+    """
+    executable = os.path.abspath(autotest.EXECUTABLE)
+    if not autotest.file_exists(executable):
+        autotest.report_failure(f'{executable} not found')
+        return 1
+
+    fixtures = make_fixtures()
+    names = args.fixture or list(fixtures)
+    start = time.monotonic()
+    with tempfile.TemporaryDirectory(prefix='autotest_matrix_', dir=AutoTest_Sandbox.pool_root()) as directory:
+        with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+            futures = {name: executor.submit(run_fixture, name, fixtures[name], directory, args)
+                       for name in names}
+            results = {name: future.result() for name, future in futures.items()}
+    elapsed = time.monotonic() - start
+
+    print_matrix(results)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    cells = [cell for result in results.values() for cell in result['cells'].values()]
+    passed = sum(verdict == 'ok' for verdict, _ in cells)
+    failed = sum(verdict == 'fail' for verdict, _ in cells)
+    unchecked = sum(verdict == 'unchecked' for verdict, _ in cells)
+    sessions = sum(result['sessions'] for result in results.values())
+    summary = (f'Matrix: {passed}/{len(cells)} passed, {failed} failed, {unchecked} unchecked '
+               f'({len(names)} fixtures x {len(SCENARIOS)} scenarios, {sessions} sessions) '
+               f'in {elapsed:.2f}s')
+    if failed:
+        autotest.report_failure(summary)
+        return 1
+    autotest.report_success(summary)
+    return 0
+
+
+def parse_arguments():
+    """
+    Parse command-line arguments.
+
+    Returns:
+        argparse.Namespace: The parsed command-line arguments.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-v", "--verbose", action="store_true", default=True,
+                        help="Enable verbose output")
+    parser.add_argument("-q", "--quiet", action="store_true", default=False,
+                        help="Enable quiet mode")
+    parser.add_argument("--nosetup", action="store_true", default=False,
+                        help="Disable setup before running tests")
+    parser.add_argument("--nocleanup", action="store_true", default=False,
+                        help="Disable cleanup after running tests")
+    parser.add_argument("--debug", action="store_true", default=False,
+                        help="Enable debug mode")
+    parser.add_argument("-f", "--fixture", nargs='+', default=None,
+                        choices=['autotest', 'empty', 'empty_queue', 'empty_history', 'single',
+                                 'punctuation', 'unicode', 'long', 'missing_queue',
+                                 'missing_history', 'missing_both'],
+                        help="Only run these fixtures")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Number of fixtures to run in parallel")
+    parser.add_argument("--timeout", type=float, default=5.0,
+                        help="Seconds before a session counts as a hang")
+    parser.add_argument("--state-only", action="store_true", default=False,
+                        help="Only compare exit status and saved files, not output")
+    parser.add_argument("--report", type=str, default=None, metavar='FILE',
+                        help="Save the matrix as JSON")
+    return parser.parse_args()
+
+
+def main():
+    """
+    Main entry point of the script.
+
+    Returns:
+        None
+    """
+    args = parse_arguments()
+
+    if args.quiet:
+        args.verbose = False
+    if args.report:
+        args.report = os.path.abspath(args.report)
+
+    if not args.nosetup:
+        autotest.setup(args)
+
+    rc = matrix(args)
+
+    if not args.nocleanup:
+        autotest.cleanup(args)
+
+    sys.exit(rc)
+
+if __name__ == "__main__":
+    main()
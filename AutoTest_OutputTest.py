@@ -16,6 +16,17 @@ import subprocess
 import shutil
 import argparse
 import re
+import glob
+import json
+import time
+import mmap
+import filecmp
+import tempfile
+import threading
+import cProfile
+from contextlib import contextmanager
+
+import AutoTest_Sandbox
 
 
 #--------------------------------------------------------------------------
@@ -59,6 +70,27 @@ STUDENT_MOVIE_QUEUE_UPDATE_FILE = 'movie_queue_updated.txt'
 AUTOTEST_MOVIE_HISTORY_UPDATE_FILE = 'AutoTest_movie_history_updated.txt'
 STUDENT_MOVIE_HISTORY_UPDATE_FILE = 'movie_history_updated.txt'
 
+SOURCE_FILES = ['main.cpp', 'Stack.h', 'Queue.h']
+GTEST_SOURCE_FILE = 'AutoTest_gtests.cpp'
+GTEST_EXECUTABLE = './AutoTest_gtests'
+GTEST_REPORT_FILE = 'test_gtests.json'
+
+# the cpplint check run by AutoTest_all.sh, graded as a test of this name
+STYLE_TEST = 'style'
+STYLE_SCRIPT = 'AutoTest_Style.sh'
+
+# ASan/UBSan builds of the executables, used to diagnose crashes
+SANITIZER_EXECUTABLES = {EXECUTABLE: './main_asan',
+                         GTEST_EXECUTABLE: './AutoTest_gtests_asan'}
+SANITIZER_LOG = 'sanitizer_report'
+SANITIZER_OPTIONS = {'ASAN_OPTIONS': f'log_path={SANITIZER_LOG}:detect_leaks=0:handle_abort=1',
+                     'UBSAN_OPTIONS': f'log_path={SANITIZER_LOG}:print_stacktrace=1:halt_on_error=1'}
+
+# local state kept between runs (ignored by the student repo via *AutoTest*)
+CACHE_DIR = os.path.join(PARENT_PROJECT, 'AutoTest_cache')
+# test ordering history stays inside the AutoTest directory
+TEST_HISTORY_FILE = os.path.join(DATA_DIR, 'AutoTest_cache', 'test_history.json')
+
 #--------------------------------------------------------------------------
 # Program commands - modify as needed
 #--------------------------------------------------------------------------
@@ -74,6 +106,17 @@ USER_COMMANDS = {'add': 'a',
 
 ADD_MOVIE = 'Black Widow'
 
+# set while a test runs in a pristine sandbox whose data files are already in place
+FIXTURES_READY = False
+
+# trace events recorded by trace_span() when --trace is given (None: not tracing)
+TRACE_EVENTS = None
+TRACE_START = 0.0
+
+# bytes of file content shown around a mismatch when a check fails
+EXCERPT_BYTES = 1024
+CHUNK_BYTES = 1 << 16
+
 
 
 #--------------------------------------------------------------------------
@@ -126,7 +169,79 @@ def report_info(msg, color=RESET):
     return
 
 
-def execute_command(cmd, args=None, accept_rc=None):
+@contextmanager
+def trace_span(name, cat='phase', **fields):
+    """
+    Record a timing span for the Chrome/Perfetto trace written by --trace.
+    Spans opened inside other spans nest in the trace viewer.
+
+    Args:
+        name (str): The span name.
+        cat (str, optional): The span category (test, phase, child, ...).
+        **fields: Values shown with the span in the trace viewer.
+
+    Yields:
+        dict: The span's fields; add to it to attach results to the span.
+    """
+    if TRACE_EVENTS is None:
+        yield fields
+        return
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        end = time.perf_counter()
+        TRACE_EVENTS.append({'name': name, 'cat': cat, 'ph': 'X',
+                             'ts': (start - TRACE_START) * 1e6,
+                             'dur': (end - start) * 1e6,
+                             'pid': os.getpid(), 'tid': threading.get_ident(),
+                             'args': fields})
+
+
+def trace_write(file):
+    """
+    Write the recorded spans as a Chrome trace (JSON object format), which
+    chrome://tracing and ui.perfetto.dev can open.
+
+    Args:
+        file (str): The path of the trace file.
+
+    Returns:
+        None
+    """
+    metadata = [{'name': 'process_name', 'ph': 'M', 'pid': os.getpid(),
+                 'args': {'name': 'AutoTest_OutputTest'}}]
+    with open(file, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': metadata + TRACE_EVENTS, 'displayTimeUnit': 'ms'}, f)
+    return
+
+
+def spawn(cmd, env=None):
+    """
+    Run a shell command and collect its resource usage.
+
+    Args:
+        cmd (str): The shell command to execute.
+        env (dict, optional): Variables added to the command's environment.
+
+    Returns:
+        tuple: (return code, dict of resource usage of the command and the
+            processes it waited for)
+    """
+    proc = subprocess.Popen(cmd, shell=True, env=dict(os.environ, **env) if env else None)
+    _, status, rusage = os.wait4(proc.pid, 0)
+    proc.returncode = rc = os.waitstatus_to_exitcode(status)
+    usage = {'utime': rusage.ru_utime,
+             'stime': rusage.ru_stime,
+             'maxrss_kb': rusage.ru_maxrss,
+             'minflt': rusage.ru_minflt,
+             'majflt': rusage.ru_majflt,
+             'nvcsw': rusage.ru_nvcsw,
+             'nivcsw': rusage.ru_nivcsw}
+    return rc, usage
+
+
+def execute_command(cmd, args=None, accept_rc=None, sanitize=True):
     """
     Executes a shell command and provides verbose and debug output based upon
     the given arguments.
@@ -137,14 +252,19 @@ def execute_command(cmd, args=None, accept_rc=None):
             Defaults to None.
          accept_rc (list, optional): A list of acceptable return codes.
             Defaults to [0].
+         sanitize (bool, optional): Rerun a crashed command under the
+            sanitizer build. Defaults to True.
     Returns:
          int: The return code of the executed command.
     Behavior:
     - If `args.verbose` is True, prints the command execution details.
-    - If `args.debug` is False, executes the command using `subprocess.call`.
+    - If `args.debug` is False, executes the command using `spawn`.
     - If `args.verbose` is True, prints the result of the command execution,
         including specific messages for segmentation faults (rc=139)
         and uncaught exceptions (rc=134).
+    - If `args.verbose` and `sanitize` are True and the command crashed,
+        reruns it under the sanitizer build of the executable and prints the
+        report (see `sanitizer_rerun`).
     """
     rc = 0
 
@@ -161,7 +281,9 @@ def execute_command(cmd, args=None, accept_rc=None):
         print(f'{GREEN}[==========]{RESET}')
 
     if not args.debug:
-        rc = subprocess.call(cmd, shell=True)
+        with trace_span('execute', cat='child', cmd=cmd) as span:
+            rc, usage = spawn(cmd)
+            span.update(rc=rc, **usage)
 
     if args.verbose:
         if rc == 139:
@@ -172,9 +294,142 @@ def execute_command(cmd, args=None, accept_rc=None):
             report_failure(f'rc = {rc}')
         else:
             report_success(f'rc = {rc}')
+
+    # the report is only shown in verbose mode, so only then pay for the rerun
+    if args.verbose and sanitize and (rc in (134, 139) or rc < 0):
+        sanitizer_rerun(cmd, args)
     return rc
 
 
+def sanitizer_rerun(cmd, args):
+    """
+    Rerun a command that crashed with the executable replaced by its
+    sanitizer build, and print the sanitizer report. The sanitizer targets
+    are not part of the default build, so in a build directory the target is
+    built (or brought up to date) first. Does nothing if the command does not
+    start with a known executable or its sanitizer build is not available.
+
+    The rerun happens in a scratch copy of the current directory, next to it
+    so relative paths resolve the same, and cannot overwrite the output and
+    updated data files of the crashed run.
+
+    Args:
+        cmd (str): The shell command that crashed.
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        str: The sanitizer report, or None if no report was produced.
+    """
+    for executable, sanitizer in SANITIZER_EXECUTABLES.items():
+        if cmd.split(maxsplit=1)[:1] == [executable]:
+            break
+    else:
+        return None
+
+    if file_exists('CMakeCache.txt'):
+        with trace_span('sanitizer build', cat='child', target=sanitizer):
+            subprocess.run(['cmake', '--build', '.', '--target', os.path.basename(sanitizer)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+    if not file_exists(sanitizer):
+        return None
+
+    cmd = sanitizer + cmd[len(executable):]
+    scratch = tempfile.mkdtemp(prefix='sanitizer', dir='..')
+    report = ''
+    try:
+        for entry in os.scandir('.'):
+            if not entry.is_file():
+                continue
+            # link the executables, copy the inputs the command may modify
+            if os.access(entry.path, os.X_OK):
+                os.symlink(os.path.abspath(entry.path), os.path.join(scratch, entry.name))
+            else:
+                shutil.copy2(entry.path, scratch)
+        with trace_span('sanitizer rerun', cat='child', cmd=cmd) as span:
+            span['rc'], _ = spawn(f'cd {scratch} && {cmd}', SANITIZER_OPTIONS)
+        for log in sorted(glob.glob(os.path.join(scratch, f'{SANITIZER_LOG}.*'))):
+            with open(log, 'r', encoding='utf-8', errors='replace') as f:
+                report += f.read()
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    if not report:
+        return None
+    if args.verbose:
+        report_info(f'[SANITIZER ] {cmd}', RED)
+        print(report, end='')
+    return report
+
+
+@contextmanager
+def file_map(file):
+    """
+    Map a file read-only into memory so it can be searched without reading
+    it into a Python string.
+
+    Args:
+        file (str): The path of the file to map.
+
+    Yields:
+        mmap.mmap or bytes: The mapped file (b'' for an empty file, which
+            cannot be mapped).
+    """
+    with open(file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+
+def file_excerpt(data, pos=0, size=EXCERPT_BYTES):
+    """
+    Decode a bounded window of file data around a position.
+
+    Args:
+        data (mmap.mmap or bytes): The file data.
+        pos (int, optional): The position to center the window on.
+            Defaults to the start of the data.
+        size (int, optional): The window size in bytes.
+
+    Returns:
+        str: The window, with markers for the bytes omitted on either side.
+    """
+    start = max(0, pos - size // 2)
+    end = min(len(data), start + size)
+    text = bytes(data[start:end]).decode('utf-8', errors='replace')
+    if start > 0:
+        text = f'... ({start} bytes omitted)\n{text}'
+    if end < len(data):
+        text = f'{text}\n... ({len(data) - end} bytes omitted)'
+    return text
+
+
+def mismatch_offset(data, start, expected):
+    """
+    Find where data diverges from expected when compared from start onward.
+    The comparison is done in bounded chunks.
+
+    Args:
+        data (mmap.mmap or bytes): The data to compare.
+        start (int): The offset in data where the comparison starts.
+        expected (mmap.mmap or bytes): The expected data.
+
+    Returns:
+        int: The offset into expected of the first differing byte.
+    """
+    offset = 0
+    while offset < len(expected):
+        a = data[start + offset:start + offset + CHUNK_BYTES]
+        b = expected[offset:offset + CHUNK_BYTES]
+        if a != b:
+            for i, (x, y) in enumerate(zip(a, b)):
+                if x != y:
+                    return offset + i
+            return offset + min(len(a), len(b))
+        offset += len(b)
+    return offset
+
+
 def file_print(file):
     """
     Prints the contents of a file.
@@ -185,9 +440,11 @@ def file_print(file):
     Returns:
         None
     """
-    with open(file, 'r', encoding='utf-8') as f:
-        filedata = f.read()
-    print(filedata)
+    sys.stdout.flush()
+    with open(file, 'rb') as f:
+        shutil.copyfileobj(f, sys.stdout.buffer, CHUNK_BYTES)
+    sys.stdout.buffer.write(b'\n')
+    sys.stdout.flush()
     return
 
 
@@ -211,7 +468,8 @@ def file_diff(file1, file2, diff_args=None, args=None):
         diff_args = '--ignore-case --ignore-blank-lines --side-by-side ' \
                     '--ignore-space-change --color=always'
     cmd = f'{diffcmd} {diff_args} {file1} {file2}'
-    rc = execute_command(cmd, args)
+    with trace_span('compare', file1=file1, file2=file2):
+        rc = execute_command(cmd, args)
     return rc
 
 
@@ -234,19 +492,20 @@ def file_contains_file(file, searchfile, args=None):
 #    if args.verbose:
 #        report_info(f'Check file {file} contains file {searchfile}')
 
-    with open(file, 'r', encoding='utf-8') as f:
-        filedata = f.read()
-    with open(searchfile, 'r', encoding='utf-8') as f:
-        searchdata = f.read()
-    if searchdata in filedata:
-        if args.verbose:
-            report_success(f'{searchfile} found in {file}')
-        return 0
-    else:
+    with trace_span('compare', file=file, searchfile=searchfile), \
+         file_map(file) as filedata, file_map(searchfile) as searchdata:
+        if filedata.find(searchdata) != -1:
+            if args.verbose:
+                report_success(f'{searchfile} found in {file}')
+            return 0
         if args.verbose:
+            # align on the first expected line to show where the files diverge
+            first_line = bytes(searchdata[:EXCERPT_BYTES]).split(b'\n', 1)[0]
+            pos = filedata.find(first_line) if first_line else -1
+            offset = mismatch_offset(filedata, pos, searchdata) if pos != -1 else 0
             report_failure(f'{searchfile} not found in {file}')
-            report_info(f'\nExpected:\n{searchdata}')
-            report_info(f'\nActual:\n{filedata}')
+            report_info(f'\nExpected:\n{file_excerpt(searchdata, offset)}')
+            report_info(f'\nActual:\n{file_excerpt(filedata, max(pos, 0) + offset)}')
         return 1
 
 
@@ -269,17 +528,16 @@ def file_contains_string(file, searchstring, args=None):
 #    if args.verbose:
 #        report_info(f'Check file {file} contains "{searchstring}"')
 
-    with open(file, 'r', encoding='utf-8') as f:
-        filedata = f.read()
-    if searchstring in filedata:
-        if args.verbose:
-            report_success(f'{searchstring} found in {file}')
-        return 0
-    else:
+    with trace_span('compare', file=file, searchstring=searchstring), \
+         file_map(file) as filedata:
+        if filedata.find(searchstring.encode('utf-8')) != -1:
+            if args.verbose:
+                report_success(f'{searchstring} found in {file}')
+            return 0
         if args.verbose:
             report_failure(f'"{searchstring}" not found in {file}')
             report_info(f'\nExpected:\n{searchstring}')
-            report_info(f'\nActual:\n{filedata}')
+            report_info(f'\nActual:\n{file_excerpt(filedata)}')
         return 1
 
 
@@ -302,17 +560,16 @@ def file_contains_regex(file, searchstring, args=None):
 #    if args.verbose:
 #        report_info(f'Check file {file} contains regex "{searchstring}"')
 
-    with open(file, 'r', encoding='utf-8') as f:
-        filedata = f.read()
-    if re.search(searchstring, filedata):
-        if args.verbose:
-            report_success(f'Regex "{searchstring}" found in {file}')
-        return 0
-    else:
+    with trace_span('compare', file=file, regex=searchstring), \
+         file_map(file) as filedata:
+        if re.search(searchstring.encode('utf-8'), filedata):
+            if args.verbose:
+                report_success(f'Regex "{searchstring}" found in {file}')
+            return 0
         if args.verbose:
             report_failure(f'Regex "{searchstring}" not found in {file}')
             report_info(f'\nExpected:\nRegex {searchstring}')
-            report_info(f'\nActual:\n{filedata}')
+            report_info(f'\nActual:\n{file_excerpt(filedata)}')
         return 1
 
 
@@ -335,6 +592,24 @@ def file_copy(src, dest):
     return 0
 
 
+def file_sync(src, dest):
+    """
+    Copy a file only if its contents changed, so unchanged files keep their
+    modification time and are not rebuilt.
+
+    Args:
+        src (str): The source file.
+        dest (str): The destination file.
+
+    Returns:
+        bool: True if dest was updated.
+    """
+    if file_exists(dest) and filecmp.cmp(src, dest, shallow=False):
+        return False
+    shutil.copyfile(src, dest)
+    return True
+
+
 def file_exists(file):
     """
     Check if a file exists at the given path.
@@ -362,6 +637,61 @@ def file_remove(file):
         os.remove(file)
     return
 
+def file_first_line(file):
+    """
+    Read the first line of a file without reading the rest of it.
+
+    Args:
+        file (str): The path to the file.
+
+    Returns:
+        str: The first line, including its newline ('' for an empty file).
+    """
+    with open(file, 'r', encoding='utf-8') as f:
+        return f.readline()
+
+
+def file_remove_first_line(file):
+    """
+    Remove the first line of a file, streaming the rest through a
+    temporary file.
+
+    Args:
+        file (str): The path to the file.
+
+    Returns:
+        str: The removed line, including its newline.
+    """
+    dirname = os.path.dirname(os.path.abspath(file))
+    with open(file, 'r', encoding='utf-8') as src, \
+         tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=dirname, delete=False) as dest:
+        line = src.readline()
+        shutil.copyfileobj(src, dest, CHUNK_BYTES)
+    os.replace(dest.name, file)
+    return line
+
+
+def file_prepend_line(file, line):
+    """
+    Insert a line at the start of a file, streaming the existing contents
+    through a temporary file.
+
+    Args:
+        file (str): The path to the file.
+        line (str): The line to insert, without its newline.
+
+    Returns:
+        None
+    """
+    dirname = os.path.dirname(os.path.abspath(file))
+    with open(file, 'r', encoding='utf-8') as src, \
+         tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=dirname, delete=False) as dest:
+        dest.write(line + '\n')
+        shutil.copyfileobj(src, dest, CHUNK_BYTES)
+    os.replace(dest.name, file)
+    return
+
+
 def copy_test_input_files():
     """
     Copy test input files from the data directory to the current directory.
@@ -369,11 +699,18 @@ def copy_test_input_files():
     Returns:
         int: 0 if the files are copied successfully, 1 otherwise.
     """
+    global FIXTURES_READY
+    if FIXTURES_READY:
+        # a fresh sandbox already holds pristine copies
+        FIXTURES_READY = False
+        return 0
+
     # make sure the data files exist; overwrite if necessary
-    for file, testfile in zip(DATAFILES, TESTDATAFILES):
-        rc = file_copy(os.path.join(DATA_DIR, testfile), file)
-        if rc != 0:
-            return rc
+    with trace_span('fixture prep'):
+        for file, testfile in zip(DATAFILES, TESTDATAFILES):
+            rc = file_copy(os.path.join(DATA_DIR, testfile), file)
+            if rc != 0:
+                return rc
     return 0
 
 
@@ -520,15 +857,16 @@ def test_add(args):
     # extract filename from STUDENT_MOVIE_QUEUE_FILE without file extension
     autotest_queue_file = f'{os.path.splitext(STUDENT_MOVIE_QUEUE_FILE)[0]}_{user_cmd}.txt'
 
-    # make a copy of the movie queue file
-    rc = file_copy(STUDENT_MOVIE_QUEUE_FILE, autotest_queue_file)
-    if rc != 0:
-        report_failure(f'{autotest_queue_file} not constructed')
-        return rc
+    with trace_span('derive expected'):
+        # make a copy of the movie queue file
+        rc = file_copy(STUDENT_MOVIE_QUEUE_FILE, autotest_queue_file)
+        if rc != 0:
+            report_failure(f'{autotest_queue_file} not constructed')
+            return rc
 
-    # append the new movie to the test movie queue file
-    with open(autotest_queue_file, 'a', encoding='utf-8') as f:
-        f.write(f'{movie}\n')
+        # append the new movie to the test movie queue file
+        with open(autotest_queue_file, 'a', encoding='utf-8') as f:
+            f.write(f'{movie}\n')
 
     # run the program
     cmd = f'{EXECUTABLE} < {input_file} > {test_output_file} 2>&1'
@@ -575,36 +913,27 @@ def test_watch(args):
     # extract filename from STUDENT_MOVIE_QUEUE_FILE without file extension
     autotest_queue_file = f'{os.path.splitext(STUDENT_MOVIE_QUEUE_FILE)[0]}_{user_cmd}.txt'
 
-    # make a copy of the movie queue file
-    rc = file_copy(STUDENT_MOVIE_QUEUE_FILE, autotest_queue_file)
-    if rc != 0:
-        report_failure(f'{autotest_queue_file} not constructed')
-        return rc
-
     # extract filename from STUDENT_MOVIE_HISTORY_FILE without file extension
     autotest_history_file = f'{os.path.splitext(STUDENT_MOVIE_HISTORY_FILE)[0]}_{user_cmd}.txt'
 
-    # make a copy of the movie history file
-    rc = file_copy(STUDENT_MOVIE_HISTORY_FILE, autotest_history_file)
-    if rc != 0:
-        report_failure(f'{autotest_history_file} not constructed')
-        return rc
+    with trace_span('derive expected'):
+        # make a copy of the movie queue file
+        rc = file_copy(STUDENT_MOVIE_QUEUE_FILE, autotest_queue_file)
+        if rc != 0:
+            report_failure(f'{autotest_queue_file} not constructed')
+            return rc
 
-    # remove the first movie from the test movie queue file
-    with open(autotest_queue_file, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    with open(autotest_queue_file, 'w', encoding='utf-8') as f:
-        f.writelines(lines[1:]) # remove the first movie
+        # make a copy of the movie history file
+        rc = file_copy(STUDENT_MOVIE_HISTORY_FILE, autotest_history_file)
+        if rc != 0:
+            report_failure(f'{autotest_history_file} not constructed')
+            return rc
 
-    # extract the first movie from the test movie queue file
-    movie = lines[0].strip()
+        # remove the first movie from the test movie queue file
+        movie = file_remove_first_line(autotest_queue_file).strip()
 
-    # prepend the first movie to the test movie history file
-    with open(autotest_history_file, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    with open(autotest_history_file, 'w', encoding='utf-8') as f:
-        f.write(movie + '\n') # prepend the first movie
-        f.writelines(lines)
+        # prepend the first movie to the test movie history file
+        file_prepend_line(autotest_history_file, movie)
 
     # run the program
     cmd = f'{EXECUTABLE} < {input_file} > {test_output_file} 2>&1'
@@ -666,29 +995,24 @@ def test_delete(args):
     # extract filename from STUDENT_MOVIE_QUEUE_FILE without file extension
     autotest_queue_file = f'{os.path.splitext(STUDENT_MOVIE_QUEUE_FILE)[0]}_{user_cmd}.txt'
 
-    # make a copy of the movie queue file
-    rc = file_copy(STUDENT_MOVIE_QUEUE_FILE, autotest_queue_file)
-    if rc != 0:
-        report_failure(f'{autotest_queue_file} not constructed')
-        return rc
-
     # extract filename from STUDENT_MOVIE_HISTORY_FILE without file extension
     autotest_history_file = f'{os.path.splitext(STUDENT_MOVIE_HISTORY_FILE)[0]}_{user_cmd}.txt'
 
-    # make a copy of the movie history file
-    rc = file_copy(STUDENT_MOVIE_HISTORY_FILE, autotest_history_file)
-    if rc != 0:
-        report_failure(f'{autotest_history_file} not constructed')
-        return rc
+    with trace_span('derive expected'):
+        # make a copy of the movie queue file
+        rc = file_copy(STUDENT_MOVIE_QUEUE_FILE, autotest_queue_file)
+        if rc != 0:
+            report_failure(f'{autotest_queue_file} not constructed')
+            return rc
 
-    # remove the first movie from the test movie queue file
-    with open(autotest_queue_file, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    with open(autotest_queue_file, 'w', encoding='utf-8') as f:
-        f.writelines(lines[1:]) # remove the first movie
+        # make a copy of the movie history file
+        rc = file_copy(STUDENT_MOVIE_HISTORY_FILE, autotest_history_file)
+        if rc != 0:
+            report_failure(f'{autotest_history_file} not constructed')
+            return rc
 
-    # extract the first movie from the test movie queue file
-    movie = lines[0].strip()
+        # remove the first movie from the test movie queue file
+        movie = file_remove_first_line(autotest_queue_file).strip()
 
     # run the program
     cmd = f'{EXECUTABLE} < {input_file} > {test_output_file} 2>&1'
@@ -784,9 +1108,8 @@ def test_recent(args):
     test_output_file = f'test_output_{user_cmd}.txt'
 
     # extract the first movie from the test movie history file
-    with open(STUDENT_MOVIE_HISTORY_FILE, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    movie = lines[0].strip()
+    with trace_span('derive expected'):
+        movie = file_first_line(STUDENT_MOVIE_HISTORY_FILE).strip()
 
     # run the program
     cmd = f'{EXECUTABLE} < {input_file} > {test_output_file} 2>&1'
@@ -865,9 +1188,8 @@ def test_next(args):
     test_output_file = f'test_output_{user_cmd}.txt'
 
     # extract the first movie from the test movie queue file
-    with open(STUDENT_MOVIE_QUEUE_FILE, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    movie = lines[0].strip()
+    with trace_span('derive expected'):
+        movie = file_first_line(STUDENT_MOVIE_QUEUE_FILE).strip()
 
     # run the program
     cmd = f'{EXECUTABLE} < {input_file} > {test_output_file} 2>&1'
@@ -922,6 +1244,253 @@ def footer(msg, rc, args):
         print(f'{BLUE}[   END    ] {msg} rc: {rc}{RESET}')
         print(f'{BLUE}[==========]{RESET}')
 
+def test_function(test):
+    """
+    Look up a test function by name.
+
+    Args:
+        test (str): The name of the test function.
+
+    Returns:
+        callable: The test function, or None if there is no such test.
+    """
+    func = globals().get(test)
+    return func if test.startswith('test_') and callable(func) else None
+
+def run_test(test, args, pool=None):
+    """
+    Run a single test function between its banner and footer.
+
+    Args:
+        test (str): The name of the test function.
+        args (argparse.Namespace): The command-line arguments.
+        pool (AutoTest_Sandbox.SandboxPool, optional): Run the test in a
+            sandbox from this pool instead of the current directory.
+
+    Returns:
+        int: The return code of the test.
+    """
+    global FIXTURES_READY
+    if pool is not None:
+        cwd = os.getcwd()
+        with pool.sandbox() as path:
+            os.chdir(path)
+            FIXTURES_READY = True
+            try:
+                return run_test(test, args)
+            finally:
+                FIXTURES_READY = False
+                os.chdir(cwd)
+
+    banner(test, args)
+    with trace_span(test, cat='test') as span:
+        func = test_function(test)
+        if func is None:
+            report_failure(f'Test function {test} not found.')
+            rc = 1
+        else:
+            rc = func(args)
+        span['rc'] = rc
+    footer(test, rc, args)
+    return rc
+
+def capture(func, *func_args):
+    """
+    Call a function with file descriptors 1 and 2 redirected to a temporary
+    file, so output from both Python and child processes is captured.
+
+    Args:
+        func (callable): The function to call.
+        *func_args: Arguments for the function.
+
+    Returns:
+        tuple: (return value, captured output)
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = [os.dup(1), os.dup(2)]
+    with tempfile.TemporaryFile() as out:
+        os.dup2(out.fileno(), 1)
+        os.dup2(out.fileno(), 2)
+        try:
+            result = func(*func_args)
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved[0], 1)
+            os.dup2(saved[1], 2)
+            os.close(saved[0])
+            os.close(saved[1])
+        out.seek(0)
+        output = out.read().decode('utf-8', errors='replace')
+    return result, output
+
+def run_gtest(test, args):
+    """
+    Run a single googletest case, as AutoTest_gtest.sh does.
+
+    Args:
+        test (str): The test name (Suite.Test).
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        int: The return code of the googletest executable.
+    """
+    banner(test, args)
+    rc = execute_command(f'{GTEST_EXECUTABLE} --gtest_filter={test}', args)
+    footer(test, rc, args)
+    return rc
+
+def run_gtests(tests, args):
+    """
+    Run googletest cases in one process and read their verdicts from its
+    JSON report. If the process dies before writing the report (e.g. a
+    crash), the cases are run one at a time instead.
+
+    Args:
+        tests (list): The googletest names (Suite.Test).
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        dict: Maps test names to return codes (0 passed, 1 failed, or the
+            crash code of a single-test run).
+    """
+    if not tests:
+        return {}
+    file_remove(GTEST_REPORT_FILE)
+    # a crash here is diagnosed by the per-test reruns below, not the batch
+    execute_command(f'{GTEST_EXECUTABLE} --gtest_filter={":".join(tests)} '
+                    f'--gtest_output=json:{GTEST_REPORT_FILE}', args, accept_rc=[0, 1],
+                    sanitize=False)
+    results = {}
+    try:
+        with open(GTEST_REPORT_FILE, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+        for suite in report.get('testsuites', []):
+            for case in suite.get('testsuite', []):
+                results[f'{suite["name"]}.{case["name"]}'] = 1 if case.get('failures') else 0
+    except (OSError, ValueError):
+        pass
+    for test in tests:
+        if test not in results:
+            results[test] = run_gtest(test, args)
+    return results
+
+def run_style(args):
+    """
+    Run the coding style check on the sources in DATA_DIR.
+
+    Args:
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        int: The return code of AutoTest_Style.sh.
+    """
+    # run through bash: copies of the script may have lost the execute bit
+    style = os.path.join(DATA_DIR, STYLE_SCRIPT)
+    return execute_command(f'bash {style} {DATA_DIR} {" ".join(SOURCE_FILES)}', args)
+
+def load_test_history(file):
+    """
+    Load the outcomes and durations recorded by previous runs.
+
+    Args:
+        file (str): The path to the history file.
+
+    Returns:
+        dict: Maps test names to their recorded 'rc', 'duration', 'runs'
+            and 'failures'. Empty if there is no usable history.
+    """
+    try:
+        with open(file, 'r', encoding='utf-8') as f:
+            history = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return history if isinstance(history, dict) else {}
+
+def save_test_history(file, history):
+    """
+    Save the test outcomes and durations for the next run.
+
+    Args:
+        file (str): The path to the history file.
+        history (dict): The history to save.
+
+    Returns:
+        None
+    """
+    try:
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        with open(file, 'w', encoding='utf-8') as f:
+            json.dump(history, f, indent=2)
+    except OSError as err:
+        report_info(f'Unable to save test history to {file}: {err}')
+    return
+
+def record_test(history, test, rc, duration):
+    """
+    Record the outcome of a test run in the history.
+
+    Args:
+        history (dict): The history to update.
+        test (str): The test name.
+        rc (int): The return code of the test.
+        duration (float): The test duration in seconds.
+
+    Returns:
+        None
+    """
+    entry = history.setdefault(test, {'runs': 0, 'failures': 0})
+    entry['runs'] += 1
+    entry['failures'] += 1 if rc != 0 else 0
+    entry['rc'] = rc
+    # smooth the duration so a single slow run does not reorder the tests
+    previous = entry.get('duration')
+    entry['duration'] = duration if previous is None else 0.5 * (previous + duration)
+    return
+
+def schedule_tests(tests, history):
+    """
+    Order tests so the ones most likely to fail quickly run first: tests
+    that failed last time, then tests without history, then tests that
+    passed, each group fastest first.
+
+    Args:
+        tests (list): The test names.
+        history (dict): The recorded test history.
+
+    Returns:
+        list: The tests in execution order.
+    """
+    def key(test):
+        entry = history.get(test)
+        if entry is None:
+            return (1, 0.0)
+        return (0 if entry.get('rc', 0) != 0 else 2, entry.get('duration', 0.0))
+    return sorted(tests, key=key)
+
+def create_sandbox_pool(size):
+    """
+    Create a pool of sandboxes holding the student data files and a link to
+    the executable. Must be called from the test directory.
+
+    Args:
+        size (int): The number of sandboxes.
+
+    Returns:
+        AutoTest_Sandbox.SandboxPool: The pool.
+    """
+    global DATA_DIR
+    # tests run inside the sandboxes, so data must be found from anywhere
+    DATA_DIR = os.path.abspath(DATA_DIR)
+    fixtures = {file: os.path.join(DATA_DIR, testfile)
+                for file, testfile in zip(DATAFILES, TESTDATAFILES)}
+    links = {os.path.basename(EXECUTABLE): os.path.abspath(EXECUTABLE)}
+    sanitizer = SANITIZER_EXECUTABLES[EXECUTABLE]
+    if file_exists(sanitizer):
+        links[os.path.basename(sanitizer)] = os.path.abspath(sanitizer)
+    return AutoTest_Sandbox.SandboxPool(size, fixtures, links)
+
 def parse_arguments():
     """
     Parse command-line arguments.
@@ -942,6 +1511,19 @@ def parse_arguments():
                         help="Enable debug mode")
     parser.add_argument("-t", "--test", nargs='+', type=str, default=None,
                         help=f"Specify the test(s) to run from: {TEST_CASES}")
+    parser.add_argument("--fail-fast", action="store_true", default=False,
+                        help="Stop at the first failing test")
+    parser.add_argument("--order", choices=['history', 'fixed'], default='history',
+                        help="Run previously failing and fastest tests first (history) "
+                             "or in the order given (fixed)")
+    parser.add_argument("--history", type=str, default=TEST_HISTORY_FILE,
+                        help="Test history file (relative to the build directory)")
+    parser.add_argument("--sandbox", type=int, nargs='?', const=2, default=0, metavar='N',
+                        help="Run each test in a pre-warmed sandbox from a pool of N (default 2)")
+    parser.add_argument("--trace", type=str, default=None, metavar='FILE',
+                        help="Write a Chrome/Perfetto trace of the run to FILE")
+    parser.add_argument("--profile", type=str, default=None, metavar='FILE',
+                        help="Write cProfile statistics of the run to FILE")
     return parser.parse_args()
 
 def test_main():
@@ -956,34 +1538,79 @@ def test_main():
     if args.quiet:
         args.verbose = False
 
-    if not args.nosetup:
-        # execute the setup function if it exists
-        try:
-            setup(args)
-        except NameError:
-            pass
+    global TRACE_EVENTS, TRACE_START
+    if args.trace:
+        # setup() changes into the test directory; keep the path the user meant
+        args.trace = os.path.abspath(args.trace)
+        TRACE_EVENTS = []
+        TRACE_START = time.perf_counter()
+    profiler = None
+    if args.profile:
+        args.profile = os.path.abspath(args.profile)
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    with trace_span('AutoTest_OutputTest', cat='run') as span:
+        if not args.nosetup:
+            # execute the setup function if it exists
+            try:
+                setup(args)
+            except NameError:
+                pass
+
+        # if no test ID is provided, run all tests
+        if not args.test:
+            tests = TEST_CASES
+        else:
+            tests = args.test
 
-    # if no test ID is provided, run all tests
-    if not args.test:
-        tests = TEST_CASES
-    else:
-        tests = args.test
+        # the history is only kept for history ordering (and not in debug mode)
+        keep_history = args.order == 'history' and not args.debug
+        history = load_test_history(args.history) if args.order == 'history' else {}
+        if args.order == 'history':
+            tests = schedule_tests(tests, history)
 
-    for test in tests:
-        banner(test, args)
-        try:
-            rc = globals()[test](args)
-        except NameError:
-            report_failure(f'Test function {test} not found.')
-            rc = 0
-        footer(test, rc, args)
+        pool = create_sandbox_pool(args.sandbox) if args.sandbox else None
 
-    if not args.nocleanup:
-        # execute the cleanup function if it exists
+        # the exit code is the first failing test's return code, or 0
+        rc = 0
         try:
-            cleanup(args)
-        except NameError:
-            pass
+            for test in tests:
+                start = time.monotonic()
+                test_rc = run_test(test, args, pool)
+                if keep_history and test_function(test) is not None:
+                    record_test(history, test, test_rc, time.monotonic() - start)
+                if test_rc != 0 and rc == 0:
+                    rc = test_rc
+                if rc != 0 and args.fail_fast:
+                    if args.verbose:
+                        report_info(f'Stopping after {test} (--fail-fast)')
+                    break
+        finally:
+            # do not leave the pool behind on /dev/shm after an error or Ctrl-C
+            if pool is not None:
+                pool.close()
+
+        if keep_history:
+            save_test_history(args.history, history)
+
+        if not args.nocleanup:
+            # execute the cleanup function if it exists
+            try:
+                cleanup(args)
+            except NameError:
+                pass
+        span['rc'] = rc
+
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+        if args.verbose:
+            report_info(f'Profile written to {args.profile}')
+    if TRACE_EVENTS is not None:
+        trace_write(args.trace)
+        if args.verbose:
+            report_info(f'Trace written to {args.trace}')
 
     sys.exit(rc)
 
@@ -0,0 +1,374 @@
+#!/usr/bin/env python
+"""
+AutoTest_Perf.py
+
+Performance tier for the Stack Project. The same workloads (large add,
+watch and delete sessions through ./main, and bulk Stack/Queue operations
+through AutoTest_perf) are run against the student's Stack.h/Queue.h and
+against the reference headers in AutoTest_reference. CPU time, maximum
+resident set size and context switches are collected with wait4, and each
+is reported as the ratio student/reference with a bootstrap confidence
+interval. With --max-ratio, a workload whose CPU time is confidently more
+than that many times the reference's fails.
+
+    AutoTest_Perf.py [-w WORKLOAD ...] [-r REPEAT] [--max-ratio X] [--report FILE]
+
+Author: Michelle Talley
+Copyright 2024 Michelle Talley University of Central Arkansas
+"""
+import sys
+import os
+import subprocess
+import argparse
+import ctypes
+import ctypes.util
+import json
+import math
+import random
+import shutil
+import signal
+import statistics
+import threading
+import time
+
+import AutoTest_OutputTest as autotest
+
+
+#--------------------------------------------------------------------------
+# Global variables - modify as needed
+#--------------------------------------------------------------------------
+# optimized builds of main and the bulk workloads; the builds with the
+# reference headers add REFERENCE_SUFFIX to the name of ./main or AutoTest_perf
+MAIN_PERF_EXECUTABLE = './main_perf'
+PERF_EXECUTABLE = './AutoTest_perf'
+REFERENCE_SUFFIX = '_reference'
+PERF_TARGETS = ['main_perf', 'main_reference', 'AutoTest_perf', 'AutoTest_perf_reference']
+PERF_DIR = 'perf_work'
+
+# workloads run through ./main, and the number of titles each handles
+MAIN_WORKLOADS = ['add', 'watch', 'delete']
+MAIN_TITLES = 20000
+# workloads run through AutoTest_perf, and their operation count
+PERF_WORKLOADS = ['stack_bulk', 'queue_bulk', 'stack_steady', 'queue_steady', 'copy']
+PERF_OPERATIONS = 200000
+
+DEFAULT_REPEAT = 5
+DEFAULT_TIMEOUT = 60
+BOOTSTRAP_SAMPLES = 2000
+CONFIDENCE = 0.95
+PR_SET_CHILD_SUBREAPER = 36  # linux/prctl.h
+
+# metric: (label, format, smallest value used in a ratio)
+METRICS = {'cpu': ('CPU time', '{:.3f}s', 0.001),
+           'maxrss_kb': ('max RSS', '{:.0f}KB', 1),
+           'ctxsw': ('context switches', '{:.0f}', 1)}
+
+
+#--------------------------------------------------------------------------
+# Workloads
+#--------------------------------------------------------------------------
+def perf_title(i):
+    """
+    A movie title for generated workloads.
+
+    Args:
+        i (int): The title number.
+
+    Returns:
+        str: The title.
+    """
+    return f'Performance Test Movie {i}: The Sequel'
+
+
+def make_workloads(args):
+    """
+    Write the input and data files of the workloads into the current
+    directory and build their commands.
+
+    Args:
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        dict: Maps workload names to (student command, reference command).
+    """
+    titles = int(MAIN_TITLES * args.scale)
+    operations = int(PERF_OPERATIONS * args.scale)
+    with open(autotest.STUDENT_MOVIE_QUEUE_FILE, 'w', encoding='utf-8') as f:
+        f.writelines(f'{perf_title(i)}\n' for i in range(titles))
+    with open(autotest.STUDENT_MOVIE_HISTORY_FILE, 'w', encoding='utf-8') as f:
+        f.writelines(f'{perf_title(i)}\n' for i in range(titles, 2 * titles))
+
+    main = os.path.join('..', os.path.basename(MAIN_PERF_EXECUTABLE))
+    main_reference = os.path.join('..', os.path.basename(autotest.EXECUTABLE) + REFERENCE_SUFFIX)
+    perf = os.path.join('..', os.path.basename(PERF_EXECUTABLE))
+    commands = {}
+    for workload in MAIN_WORKLOADS:
+        input_file = f'perf_input_{workload}.txt'
+        with open(input_file, 'w', encoding='utf-8') as f:
+            cmd = autotest.USER_COMMANDS[workload]
+            for i in range(titles):
+                f.write(f'{cmd}\n{perf_title(2 * titles + i)}\n' if workload == 'add' else f'{cmd}\n')
+            f.write(f'{autotest.USER_COMMANDS["exit"]}\n')
+        commands[workload] = tuple(f'{exe} < {input_file} > /dev/null 2>&1'
+                                   for exe in (main, main_reference))
+    for workload in PERF_WORKLOADS:
+        commands[workload] = tuple(f'{exe} {workload} {operations} > /dev/null'
+                                   for exe in (perf, perf + REFERENCE_SUFFIX))
+    return commands
+
+
+def subreaper():
+    """
+    Make this process adopt its orphaned descendants (Linux), so a command
+    started in the background by a shell can be waited for directly.
+
+    Returns:
+        bool: True if this process is now a child subreaper.
+    """
+    name = ctypes.util.find_library('c')
+    if not sys.platform.startswith('linux') or name is None:
+        return False
+    return ctypes.CDLL(name, use_errno=True).prctl(PR_SET_CHILD_SUBREAPER, 1, 0, 0, 0) == 0
+
+
+def run_measured(cmd, timeout, adopt):
+    """
+    Run a shell command and collect its resource usage with wait4.
+
+    A process's maximum RSS includes that of the process it was forked from,
+    so a direct child of this (much larger) Python process would report
+    Python's. With adopt, the shell starts the command in the background and
+    exits, and the command is waited for once it is reparented to us.
+
+    Args:
+        cmd (str): The shell command.
+        timeout (float): Seconds before the command is killed.
+        adopt (bool): This process is a child subreaper (see subreaper()).
+
+    Returns:
+        dict: rc (124 on timeout), cpu (user + system seconds), maxrss_kb,
+            ctxsw (voluntary + involuntary) and wall (seconds).
+    """
+    start = time.monotonic()
+    proc = subprocess.Popen(f'{cmd} &' if adopt else cmd, shell=True, start_new_session=True)
+    timed_out = threading.Event()
+
+    def kill():
+        timed_out.set()
+        os.killpg(proc.pid, signal.SIGKILL)
+
+    timer = threading.Timer(timeout, kill)
+    timer.start()
+    try:
+        if adopt:
+            proc.wait()
+            _, status, rusage = os.wait4(-1, 0)
+        else:
+            _, status, rusage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+    finally:
+        timer.cancel()
+    rc = os.waitstatus_to_exitcode(status)
+    return {'rc': 124 if timed_out.is_set() else rc,
+            'cpu': rusage.ru_utime + rusage.ru_stime,
+            'maxrss_kb': rusage.ru_maxrss,
+            'ctxsw': rusage.ru_nvcsw + rusage.ru_nivcsw,
+            'wall': time.monotonic() - start}
+
+
+def ratio_interval(student, reference, floor, rng):
+    """
+    Estimate the ratio student/reference from paired samples: the geometric
+    mean of the per-pair ratios, with a percentile bootstrap interval.
+
+    Args:
+        student (list): The student's samples.
+        reference (list): The reference samples, paired with student.
+        floor (float): Values are raised to at least this before dividing.
+        rng (random.Random): The random number generator.
+
+    Returns:
+        tuple: (ratio, lower bound, upper bound)
+    """
+    logs = [math.log(max(s, floor) / max(r, floor)) for s, r in zip(student, reference)]
+    means = sorted(statistics.fmean(rng.choices(logs, k=len(logs)))
+                   for _ in range(BOOTSTRAP_SAMPLES))
+    tail = (1 - CONFIDENCE) / 2
+    lower = means[int(tail * (BOOTSTRAP_SAMPLES - 1))]
+    upper = means[int((1 - tail) * (BOOTSTRAP_SAMPLES - 1))]
+    return math.exp(statistics.fmean(logs)), math.exp(lower), math.exp(upper)
+
+
+def measure(commands, args, rng):
+    """
+    Run a workload against the student and reference builds, alternating
+    which goes first, after one discarded warm-up run of each.
+
+    Args:
+        commands (tuple): (student command, reference command).
+        args (argparse.Namespace): The command-line arguments.
+        rng (random.Random): The random number generator for the bootstrap.
+
+    Returns:
+        dict: The samples, medians and ratios of each metric, or an 'error'.
+    """
+    samples = {'student': [], 'reference': []}
+    for i in range(args.repeat + 1):
+        order = ['student', 'reference'] if i % 2 else ['reference', 'student']
+        runs = {}
+        for side in order:
+            runs[side] = run_measured(commands[side == 'reference'], args.timeout, args.adopt)
+            if runs[side]['rc'] != 0:
+                reason = 'timed out' if runs[side]['rc'] == 124 else f'rc = {runs[side]["rc"]}'
+                return {'error': f'{side} {reason}', 'command': commands[side == 'reference']}
+        if i > 0:
+            for side, run in runs.items():
+                samples[side].append(run)
+
+    result = {'metrics': {}}
+    for metric, (_, _, floor) in METRICS.items():
+        student = [run[metric] for run in samples['student']]
+        reference = [run[metric] for run in samples['reference']]
+        ratio, lower, upper = ratio_interval(student, reference, floor, rng)
+        result['metrics'][metric] = {'student': statistics.median(student),
+                                     'reference': statistics.median(reference),
+                                     'ratio': ratio, 'lower': lower, 'upper': upper,
+                                     'student_samples': student, 'reference_samples': reference}
+    return result
+
+
+def print_result(workload, result, max_ratio):
+    """
+    Print the measurements of a workload.
+
+    Args:
+        workload (str): The workload name.
+        result (dict): The result from measure().
+        max_ratio (float): The CPU time ratio that fails (None: not graded).
+
+    Returns:
+        None
+    """
+    if 'error' in result:
+        autotest.report_info(f'[  FAILED  ] {workload}: {result["error"]} ({result["command"]})',
+                             autotest.RED)
+        return
+    for metric, (label, fmt, _) in METRICS.items():
+        m = result['metrics'][metric]
+        color = autotest.RESET
+        if metric == 'cpu' and max_ratio is not None:
+            color = autotest.RED if m['lower'] > max_ratio else autotest.GREEN
+        autotest.report_info(f'{workload if metric == "cpu" else "":<14} {label:<17} '
+                             f'student {fmt.format(m["student"]):>10}   '
+                             f'reference {fmt.format(m["reference"]):>10}   '
+                             f'ratio {m["ratio"]:7.2f}x [{m["lower"]:.2f}, {m["upper"]:.2f}]', color)
+    return
+
+
+def perf(args):
+    """
+    Build the performance targets, run the selected workloads and report.
+
+    Args:
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        int: 0 if every workload ran (and was within --max-ratio), 1 otherwise.
+    """
+    proc = subprocess.run(['cmake', '--build', '.', '--parallel', '--target'] + PERF_TARGETS,
+                          stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, check=False)
+    if proc.returncode != 0:
+        print(proc.stdout, end='')
+        autotest.report_failure('Unable to build the performance targets')
+        return 1
+
+    args.adopt = subreaper()
+    if not args.adopt:
+        autotest.report_info('Max RSS includes this process (no child subreaper support)')
+    shutil.rmtree(PERF_DIR, ignore_errors=True)
+    os.makedirs(PERF_DIR)
+    os.chdir(PERF_DIR)
+    rng = random.Random(args.seed)
+    results = {}
+    try:
+        commands = make_workloads(args)
+        autotest.report_info(f'[==========] {args.repeat} paired runs per workload, '
+                             f'{CONFIDENCE:.0%} confidence intervals', autotest.BLUE)
+        for workload in args.workload or list(commands):
+            results[workload] = measure(commands[workload], args, rng)
+            print_result(workload, results[workload], args.max_ratio)
+    finally:
+        os.chdir('..')
+        shutil.rmtree(PERF_DIR, ignore_errors=True)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    failed = [workload for workload, result in results.items()
+              if 'error' in result or (args.max_ratio is not None and
+                                       result['metrics']['cpu']['lower'] > args.max_ratio)]
+    if failed:
+        autotest.report_failure(f'Performance: {" ".join(failed)}')
+        return 1
+    if args.max_ratio is not None:
+        autotest.report_success(f'Performance: every workload within {args.max_ratio:g}x of the reference')
+    return 0
+
+
+def parse_arguments():
+    """
+    Parse command-line arguments.
+
+    Returns:
+        argparse.Namespace: The parsed command-line arguments.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nosetup", action="store_true", default=False,
+                        help="Disable setup before running tests")
+    parser.add_argument("--nocleanup", action="store_true", default=False,
+                        help="Disable cleanup after running tests")
+    parser.add_argument("--debug", action="store_true", default=False,
+                        help="Enable debug mode")
+    parser.add_argument("-w", "--workload", nargs='+', choices=MAIN_WORKLOADS + PERF_WORKLOADS,
+                        default=None, help="Only run these workloads")
+    parser.add_argument("-r", "--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="Paired runs per workload")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Multiply the workload sizes by this factor")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help="Seconds before a single run is killed")
+    parser.add_argument("--max-ratio", type=float, default=None,
+                        help="Fail workloads whose CPU time is confidently more than this "
+                             "many times the reference's")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Seed for the bootstrap resampling")
+    parser.add_argument("--report", type=str, default=None, metavar='FILE',
+                        help="Save the measurements as JSON")
+    return parser.parse_args()
+
+
+def main():
+    """
+    Main entry point of the script.
+
+    Returns:
+        None
+    """
+    args = parse_arguments()
+    args.verbose = True
+    if args.report:
+        args.report = os.path.abspath(args.report)
+
+    if not args.nosetup:
+        autotest.setup(args)
+
+    rc = perf(args)
+
+    if not args.nocleanup:
+        autotest.cleanup(args)
+
+    sys.exit(rc)
+
+if __name__ == "__main__":
+    main()
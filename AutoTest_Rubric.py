@@ -0,0 +1,347 @@
+#!/usr/bin/env python
+"""
+AutoTest_Rubric.py
+
+Grades the Stack Project from the points in AutoTest_gitclassroom_tests.xlsx.
+The Classroom sheet of the workbook is compiled once into a cached rubric
+(AutoTest_cache/rubric.json, rebuilt when the workbook's modification time
+and hash change). The output tests then run in-process through
+AutoTest_OutputTest.run_test, the googletests run in a single process with
+JSON output, and one graded report is printed (and optionally saved as JSON).
+A saved report can be rescored against the current rubric without running
+anything.
+
+Author: Michelle Talley
+Copyright 2024 Michelle Talley University of Central Arkansas
+"""
+import sys
+import os
+import argparse
+import json
+import re
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+
+import AutoTest_OutputTest as autotest
+import AutoTest_Impact as impact
+
+
+#--------------------------------------------------------------------------
+# Global variables - modify as needed
+#--------------------------------------------------------------------------
+RUBRIC_WORKBOOK = 'AutoTest_gitclassroom_tests.xlsx'
+RUBRIC_SHEET = 'Classroom'
+RUBRIC_CACHE_FILE = os.path.join(autotest.CACHE_DIR, 'rubric.json')
+
+# rubric rows whose test cannot be derived from the row name
+RUBRIC_TESTS = {'Coding Style': autotest.STYLE_TEST}
+
+XLSX_NS = {'m': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main',
+           'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'}
+XLSX_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+
+#--------------------------------------------------------------------------
+# Rubric
+#--------------------------------------------------------------------------
+def read_sheet(workbook, sheet):
+    """
+    Read the cell values of one sheet of an .xlsx workbook.
+
+    Args:
+        workbook (str): The path to the workbook.
+        sheet (str): The sheet name.
+
+    Returns:
+        list: One dict per row, mapping column letters to cell text.
+    """
+    with zipfile.ZipFile(workbook) as z:
+        strings = []
+        if 'xl/sharedStrings.xml' in z.namelist():
+            for si in ET.fromstring(z.read('xl/sharedStrings.xml')).findall('m:si', XLSX_NS):
+                strings.append(''.join(t.text or '' for t in si.iter(f'{{{XLSX_NS["m"]}}}t')))
+        rels = {rel.get('Id'): rel.get('Target')
+                for rel in ET.fromstring(z.read('xl/_rels/workbook.xml.rels'))
+                if rel.tag == f'{XLSX_REL_NS}Relationship'}
+        target = None
+        for entry in ET.fromstring(z.read('xl/workbook.xml')).iter(f'{{{XLSX_NS["m"]}}}sheet'):
+            if entry.get('name') == sheet:
+                target = rels[entry.get(f'{{{XLSX_NS["r"]}}}id')]
+        if target is None:
+            raise KeyError(f'sheet {sheet} not found in {workbook}')
+        root = ET.fromstring(z.read(f'xl/{target.lstrip("/").removeprefix("xl/")}'))
+
+    rows = []
+    for row in root.iter(f'{{{XLSX_NS["m"]}}}row'):
+        cells = {}
+        for cell in row.findall('m:c', XLSX_NS):
+            column = re.match(r'[A-Z]+', cell.get('r')).group()
+            value = cell.find('m:v', XLSX_NS)
+            if cell.get('t') == 'inlineStr':
+                cells[column] = ''.join(t.text or '' for t in cell.iter(f'{{{XLSX_NS["m"]}}}t'))
+            elif value is not None:
+                cells[column] = strings[int(value.text)] if cell.get('t') == 's' else value.text
+        rows.append(cells)
+    return rows
+
+
+def test_id(name, run, known):
+    """
+    Work out which test a rubric row grades. A test named in the row's Run
+    command is used if it exists; otherwise the name is translated, e.g.
+    'Test Exit' -> test_exit and 'Stack Top Empty Stack' ->
+    StackTest.TopEmptyStack.
+
+    Args:
+        name (str): The Name column.
+        run (str): The Run column ('' if empty).
+        known (list): The names of the existing tests.
+
+    Returns:
+        str: The test name.
+    """
+    if name in RUBRIC_TESTS:
+        return RUBRIC_TESTS[name]
+    match = re.search(r'AutoTest_gtest\.sh\s+(?:--gtest_filter=)?(\S+)|'
+                      r'AutoTest_OutputTest\.py.*-t\s+(\w+)', run)
+    if match and (match.group(1) or match.group(2)) in known:
+        return match.group(1) or match.group(2)
+    words = name.split()
+    if words[0] == 'Test':
+        return 'test_' + '_'.join(word.lower() for word in words[1:])
+    return f'{words[0]}Test.' + ''.join(word[0].upper() + word[1:] for word in words[1:])
+
+
+def compile_rubric(workbook, known):
+    """
+    Compile the Classroom sheet into a rubric.
+
+    Args:
+        workbook (str): The path to the workbook.
+        known (list): The names of the existing tests.
+
+    Returns:
+        dict: {'items': [{'name', 'description', 'test', 'points'}],
+            'total': points available, 'sheet_total': the sheet's Total row}
+    """
+    items = []
+    sheet_total = None
+    header = None
+    for cells in read_sheet(workbook, RUBRIC_SHEET):
+        name = cells.get('A', '').strip()
+        if header is None:
+            if name == 'Name':
+                header = {value: column for column, value in cells.items()}
+            continue
+        if not name:
+            continue
+        points = float(cells.get(header['Points'], 0) or 0)
+        if name.startswith('Total'):
+            sheet_total = points
+            continue
+        test = test_id(name, cells.get(header.get('Run'), '') or '', known)
+        if test not in known:
+            autotest.report_failure(f'Rubric row {name}: no test named {test}')
+        items.append({'name': name,
+                      'description': cells.get(header.get('Description'), '') or '',
+                      'test': test,
+                      'points': points})
+    return {'items': items,
+            'total': sum(item['points'] for item in items),
+            'sheet_total': sheet_total}
+
+
+def load_rubric(workbook, cache_file, force=False):
+    """
+    Load the compiled rubric, recompiling it if the workbook changed. The
+    modification time is checked first; the hash only when it differs.
+
+    Args:
+        workbook (str): The path to the workbook.
+        cache_file (str): The path to the compiled rubric.
+        force (bool, optional): Recompile even if the cache is current.
+
+    Returns:
+        dict: The rubric.
+    """
+    mtime = os.stat(workbook).st_mtime_ns
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        cached = {}
+    if not force and cached.get('mtime') == mtime:
+        return cached
+
+    digest = impact.file_hash(workbook)
+    if force or cached.get('sha256') != digest:
+        cached = compile_rubric(workbook, impact.all_tests() + [autotest.STYLE_TEST])
+        cached['sha256'] = digest
+    cached['source'] = os.path.basename(workbook)
+    cached['mtime'] = mtime
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    with open(cache_file, 'w', encoding='utf-8') as f:
+        json.dump(cached, f, indent=2)
+    return cached
+
+
+#--------------------------------------------------------------------------
+# Running the tests
+#--------------------------------------------------------------------------
+def run_rubric(rubric, args):
+    """
+    Run every test the rubric grades.
+
+    Args:
+        rubric (dict): The rubric.
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        dict: Maps test names to return codes.
+    """
+    tests = [item['test'] for item in rubric['items']]
+    if args.test:
+        tests = [test for test in tests if test in args.test]
+    results = {}
+    for test in tests:
+        if test == autotest.STYLE_TEST:
+            results[test] = autotest.run_style(args)
+        elif test in autotest.TEST_CASES:
+            results[test] = autotest.run_test(test, args)
+    results.update(autotest.run_gtests([test for test in tests if '.' in test], args))
+    return results
+
+
+#--------------------------------------------------------------------------
+# Scoring
+#--------------------------------------------------------------------------
+def score(rubric, results):
+    """
+    Score test results against the rubric.
+
+    Args:
+        rubric (dict): The rubric.
+        results (dict): Maps test names to return codes.
+
+    Returns:
+        dict: The graded report: {'items': [... with 'rc' and 'earned'],
+            'earned', 'total', 'results'}
+    """
+    items = []
+    for item in rubric['items']:
+        rc = results.get(item['test'])
+        items.append(dict(item, rc=rc, earned=item['points'] if rc == 0 else 0.0))
+    return {'items': items,
+            'earned': sum(item['earned'] for item in items),
+            'total': rubric['total'],
+            'results': results,
+            'rubric': {'source': rubric.get('source'), 'sha256': rubric.get('sha256')},
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def print_report(report):
+    """
+    Print the graded report.
+
+    Args:
+        report (dict): The report from score().
+
+    Returns:
+        None
+    """
+    autotest.report_info('[==========]', autotest.BLUE)
+    autotest.report_info(f'[  GRADE   ] {report["rubric"]["source"]}', autotest.BLUE)
+    autotest.report_info('[----------]', autotest.BLUE)
+    for item in report['items']:
+        if item['rc'] is None:
+            status, color = 'NOT RUN', autotest.RESET
+        elif item['rc'] == 0:
+            status, color = 'PASSED', autotest.GREEN
+        else:
+            status, color = f'FAILED {item["rc"]}', autotest.RED
+        autotest.report_info(f'{item["name"]:<28} {item["test"]:<28} {status:<10} '
+                             f'{item["earned"]:g}/{item["points"]:g}', color)
+    autotest.report_info('[----------]', autotest.BLUE)
+    autotest.report_info(f'[  TOTAL   ] {report["earned"]:g}/{report["total"]:g}', autotest.BLUE)
+    autotest.report_info('[==========]', autotest.BLUE)
+    return
+
+
+def parse_arguments():
+    """
+    Parse command-line arguments.
+
+    Returns:
+        argparse.Namespace: The parsed command-line arguments.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-v", "--verbose", action="store_true", default=True,
+                        help="Enable verbose output")
+    parser.add_argument("-q", "--quiet", action="store_true", default=False,
+                        help="Enable quiet mode")
+    parser.add_argument("--nosetup", action="store_true", default=False,
+                        help="Disable setup before running tests")
+    parser.add_argument("--nocleanup", action="store_true", default=False,
+                        help="Disable cleanup after running tests")
+    parser.add_argument("--debug", action="store_true", default=False,
+                        help="Enable debug mode")
+    parser.add_argument("-t", "--test", nargs='+', type=str, default=None,
+                        help="Only run these tests (the others score 0)")
+    parser.add_argument("--workbook", type=str, default=None,
+                        help=f"Rubric workbook (default: {RUBRIC_WORKBOOK} in the AutoTest directory)")
+    parser.add_argument("--cache", type=str, default=RUBRIC_CACHE_FILE,
+                        help="Compiled rubric (relative to the build directory)")
+    parser.add_argument("--recompile", action="store_true", default=False,
+                        help="Recompile the rubric even if the cache is current")
+    parser.add_argument("--report", type=str, default=None, metavar='FILE',
+                        help="Save the graded report as JSON")
+    parser.add_argument("--rescore", type=str, default=None, metavar='FILE',
+                        help="Score the results of a saved report instead of running the tests")
+    return parser.parse_args()
+
+
+def main():
+    """
+    Main entry point of the script.
+
+    Returns:
+        None
+    """
+    args = parse_arguments()
+
+    if args.quiet:
+        args.verbose = False
+    # setup() changes into the build directory; keep the paths the user meant
+    for option in ('workbook', 'report', 'rescore'):
+        if getattr(args, option):
+            setattr(args, option, os.path.abspath(getattr(args, option)))
+
+    if not args.nosetup:
+        autotest.setup(args)
+
+    rubric = load_rubric(args.workbook or os.path.join(autotest.DATA_DIR, RUBRIC_WORKBOOK),
+                         args.cache, args.recompile)
+    if rubric.get('sheet_total') is not None and rubric['sheet_total'] != rubric['total']:
+        autotest.report_failure(f'Rubric points add up to {rubric["total"]:g}, '
+                                f'but the sheet total is {rubric["sheet_total"]:g}')
+
+    if args.rescore:
+        with open(args.rescore, 'r', encoding='utf-8') as f:
+            results = json.load(f)['results']
+    else:
+        results = run_rubric(rubric, args)
+    report = score(rubric, results)
+    print_report(report)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if not args.nocleanup:
+        autotest.cleanup(args)
+
+    sys.exit(0 if report['earned'] == report['total'] else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+AutoTest_Sandbox.py
+
+Pre-warmed pool of isolated working directories for the Stack Project tests.
+The test fixtures are copied once into a master directory (on tmpfs when one is
+available) and materialized into each sandbox by reflink, hard link or copy.
+A used sandbox is rolled back by removing the files a test created and
+re-materializing only the fixtures it changed, so acquiring a sandbox does not
+recopy anything.
+
+Author: Michelle Talley
+Copyright 2024 Michelle Talley University of Central Arkansas
+"""
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import queue
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; fall back to plain copies
+    fcntl = None
+
+
+#--------------------------------------------------------------------------
+# Global variables - modify as needed
+#--------------------------------------------------------------------------
+# preferred locations for the pool, in order; tmpfs keeps fixture I/O in memory
+POOL_ROOTS = ['/dev/shm', None]
+FICLONE = 0x40049409  # linux/fs.h: _IOW(0x94, 9, int)
+
+
+def reflink(src, dest):
+    """
+    Create dest as a copy-on-write clone of src.
+
+    Args:
+        src (str): The source file.
+        dest (str): The destination file.
+
+    Returns:
+        bool: True if the clone was made, False if the file system (or
+            platform) does not support it.
+    """
+    if fcntl is None:
+        return False
+    with open(src, 'rb') as s, open(dest, 'wb') as d:
+        try:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        except OSError:
+            return False
+    return True
+
+
+def pool_root():
+    """
+    Pick the directory the pool is created in.
+
+    Returns:
+        str: A writable tmpfs directory if available, else None (the
+            default temporary directory).
+    """
+    for root in POOL_ROOTS:
+        if root is None or (os.path.isdir(root) and os.access(root, os.W_OK)):
+            return root
+    return None
+
+
+class SandboxPool:
+    """
+    A fixed-size pool of working directories that all start out holding the
+    same fixture files and links.
+
+    Args:
+        size (int): The number of sandboxes to prepare.
+        fixtures (dict): Maps file names inside a sandbox to source files.
+        links (dict, optional): Maps names inside a sandbox to the (absolute)
+            paths they should be symbolic links to, e.g. the executable.
+        hardlink (bool, optional): Share fixtures with the master copy by
+            hard link. Only used when it is safe: the master is read-only and
+            the process is not root (root ignores the permission bits).
+    """
+
+    def __init__(self, size, fixtures, links=None, hardlink=False):
+        self.root = tempfile.mkdtemp(prefix='autotest_pool_', dir=pool_root())
+        self.master = os.path.join(self.root, 'master')
+        self.fixtures = list(fixtures)
+        self.links = dict(links or {})
+        self.snapshots = {}
+        self.ready = queue.Queue()
+        self.dirty = queue.Queue()
+
+        os.makedirs(self.master)
+        for name, src in fixtures.items():
+            shutil.copyfile(src, os.path.join(self.master, name))
+            os.chmod(os.path.join(self.master, name), stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        self.hardlink = hardlink and hasattr(os, 'geteuid') and os.geteuid() != 0
+
+        for i in range(size):
+            path = os.path.join(self.root, f'sandbox{i}')
+            os.makedirs(path)
+            self.snapshots[path] = {}
+            self.reset(path)
+            self.ready.put(path)
+
+        # sandboxes are rolled back in the background so acquire() never waits on I/O
+        self.resetter = threading.Thread(target=self._reset_loop, daemon=True)
+        self.resetter.start()
+
+    def materialize(self, name, path):
+        """
+        Place a pristine copy of a fixture in a sandbox.
+
+        Args:
+            name (str): The fixture file name.
+            path (str): The sandbox directory.
+
+        Returns:
+            None
+        """
+        src = os.path.join(self.master, name)
+        dest = os.path.join(path, name)
+        if os.path.lexists(dest):
+            os.remove(dest)
+        if self.hardlink:
+            os.link(src, dest)
+        elif not reflink(src, dest):
+            shutil.copyfile(src, dest)
+        st = os.stat(dest)
+        self.snapshots[path][name] = (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def reset(self, path):
+        """
+        Roll a sandbox back to its pristine state: remove everything a test
+        created and re-materialize only the fixtures that were changed.
+
+        Args:
+            path (str): The sandbox directory.
+
+        Returns:
+            None
+        """
+        snapshot = self.snapshots[path]
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.name in self.fixtures or entry.name in self.links:
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                else:
+                    os.remove(entry.path)
+        for name in self.fixtures:
+            try:
+                st = os.stat(os.path.join(path, name), follow_symlinks=False)
+                current = (st.st_ino, st.st_size, st.st_mtime_ns)
+            except FileNotFoundError:
+                current = None
+            if current is None or current != snapshot.get(name):
+                self.materialize(name, path)
+        for name, target in self.links.items():
+            link = os.path.join(path, name)
+            if not os.path.islink(link) or os.readlink(link) != target:
+                if os.path.lexists(link):
+                    os.remove(link)
+                os.symlink(target, link)
+
+    def replace(self, path=None):
+        """
+        Discard a sandbox that could not be rolled back and create a new one
+        in its place.
+
+        Args:
+            path (str, optional): The sandbox directory to discard.
+
+        Returns:
+            str: The new sandbox directory.
+        """
+        if path is not None:
+            self.snapshots.pop(path, None)
+            shutil.rmtree(path, ignore_errors=True)
+        path = tempfile.mkdtemp(prefix='sandbox', dir=self.root)
+        self.snapshots[path] = {}
+        try:
+            self.reset(path)
+        except OSError:
+            self.snapshots.pop(path, None)
+            shutil.rmtree(path, ignore_errors=True)
+            raise
+        return path
+
+    def _reset_loop(self):
+        while True:
+            path = self.dirty.get()
+            if path is None:
+                return
+            # a failed reset (e.g. ENOSPC, or a file the test made
+            # unremovable) must not stop the thread, or acquire() waits forever
+            try:
+                self.reset(path)
+            except OSError:
+                try:
+                    path = self.replace(path)
+                except OSError as err:
+                    path = err
+            self.ready.put(path)
+
+    def acquire(self):
+        """
+        Take a pristine sandbox from the pool, waiting if all are in use.
+
+        Returns:
+            str: The sandbox directory.
+
+        Raises:
+            OSError: If a sandbox could not be rolled back or replaced. The
+                slot is kept, so a later acquire() tries to replace it again.
+        """
+        path = self.ready.get()
+        if isinstance(path, OSError):
+            try:
+                return self.replace()
+            except OSError:
+                self.ready.put(path)
+                raise
+        return path
+
+    def release(self, path):
+        """
+        Return a sandbox to the pool; it is rolled back in the background.
+
+        Args:
+            path (str): The sandbox directory.
+
+        Returns:
+            None
+        """
+        self.dirty.put(path)
+
+    @contextmanager
+    def sandbox(self):
+        """
+        Acquire a sandbox for the duration of a with block.
+
+        Yields:
+            str: The sandbox directory.
+        """
+        path = self.acquire()
+        try:
+            yield path
+        finally:
+            self.release(path)
+
+    def close(self):
+        """
+        Stop the background resets and remove the pool from disk.
+
+        Returns:
+            None
+        """
+        self.dirty.put(None)
+        self.resetter.join()
+        shutil.rmtree(self.root, ignore_errors=True)
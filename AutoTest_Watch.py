@@ -0,0 +1,347 @@
+#!/usr/bin/env python
+"""
+AutoTest_Watch.py
+
+Watch mode for local development. Monitors main.cpp, Stack.h and Queue.h
+in the source directory (with inotify where available, by polling
+otherwise). When one is saved, it is copied into the AutoTest directory, only
+the targets that depend on it are rebuilt incrementally in the existing
+build directory, and only the tests whose dependencies changed are rerun.
+Run AutoTest_setup.sh once first to configure the build directory.
+
+    AutoTest_Watch.py [--poll] [--sanitize]
+
+Author: Michelle Talley
+Copyright 2024 Michelle Talley University of Central Arkansas
+"""
+import sys
+import os
+import subprocess
+import argparse
+import ctypes
+import ctypes.util
+import select
+import struct
+import time
+
+import AutoTest_OutputTest as autotest
+import AutoTest_Impact as impact
+
+
+#--------------------------------------------------------------------------
+# Global variables - modify as needed
+#--------------------------------------------------------------------------
+# build targets that must be rebuilt when a source file changes
+WATCH_TARGETS = {'main.cpp': ['main'],
+                 'Stack.h': ['main', 'AutoTest_gtests'],
+                 'Queue.h': ['main', 'AutoTest_gtests']}
+SANITIZER_SUFFIX = '_asan'
+
+POLL_SECONDS = 0.5
+# editors often write a file in several steps; wait this long for more events
+DEBOUNCE_SECONDS = 0.1
+
+# linux/inotify.h
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+INOTIFY_EVENT = struct.Struct('iIII')
+
+
+#--------------------------------------------------------------------------
+# File watching
+#--------------------------------------------------------------------------
+def inotify_open(directory):
+    """
+    Start watching a directory for files being written, created or renamed
+    into it.
+
+    Args:
+        directory (str): The directory to watch.
+
+    Returns:
+        int: The inotify file descriptor, or None if inotify is not available.
+    """
+    name = ctypes.util.find_library('c')
+    if not sys.platform.startswith('linux') or name is None:
+        return None
+    libc = ctypes.CDLL(name, use_errno=True)
+    if not hasattr(libc, 'inotify_init1'):
+        return None
+    fd = libc.inotify_init1(os.O_CLOEXEC)
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(directory),
+                              IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def inotify_names(fd, timeout):
+    """
+    Read the names of the files reported by inotify.
+
+    Args:
+        fd (int): The inotify file descriptor.
+        timeout (float): Seconds to wait for the first event (None: forever).
+
+    Returns:
+        set: The file names (empty if the timeout expired).
+    """
+    names = set()
+    while select.select([fd], [], [], timeout)[0]:
+        data = os.read(fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            _, _, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            names.add(os.fsdecode(data[offset:offset + length].rstrip(b'\0')))
+            offset += length
+        timeout = DEBOUNCE_SECONDS
+    return names
+
+
+def stat_snapshot(directory, names):
+    """
+    Record the modification time and size of the watched files.
+
+    Args:
+        directory (str): The directory holding the files.
+        names (list): The file names.
+
+    Returns:
+        dict: Maps file names to (mtime, size), or None if missing.
+    """
+    snapshot = {}
+    for name in names:
+        try:
+            st = os.stat(os.path.join(directory, name))
+            snapshot[name] = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            snapshot[name] = None
+    return snapshot
+
+
+def changes(directory, names, poll=False):
+    """
+    Wait for watched files to be saved.
+
+    Args:
+        directory (str): The directory holding the files.
+        names (list): The file names to watch.
+        poll (bool, optional): Poll even if inotify is available.
+
+    Yields:
+        set: The names of the files that were saved (possibly with unchanged
+            content).
+    """
+    fd = None if poll else inotify_open(directory)
+    if fd is None:
+        autotest.report_info(f'Polling {directory} every {POLL_SECONDS}s')
+        snapshot = stat_snapshot(directory, names)
+    try:
+        while True:
+            if fd is not None:
+                saved = inotify_names(fd, None) & set(names)
+            else:
+                time.sleep(POLL_SECONDS)
+                current = stat_snapshot(directory, names)
+                saved = {name for name in names if current[name] != snapshot[name]}
+                snapshot = current
+            if saved:
+                yield saved
+    finally:
+        if fd is not None:
+            os.close(fd)
+
+
+#--------------------------------------------------------------------------
+# Build and test
+#--------------------------------------------------------------------------
+def sync_sources(names):
+    """
+    Copy changed source files from the source directory into the AutoTest
+    directory, where the build reads them.
+
+    Args:
+        names (iterable): The source file names.
+
+    Returns:
+        set: The names of the files whose content changed.
+    """
+    changed = set()
+    for name in names:
+        src = os.path.join(autotest.PARENT_PROJECT, name)
+        if autotest.file_exists(src) and autotest.file_sync(src, os.path.join(autotest.DATA_DIR, name)):
+            changed.add(name)
+    return changed
+
+
+def build(changed, args):
+    """
+    Rebuild the targets that depend on the changed files. Without
+    --sanitize, the now stale sanitizer executables are removed so a crash
+    is never diagnosed against old code.
+
+    Args:
+        changed (set): The changed source files.
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        tuple: (return code, build output)
+    """
+    targets = sorted({target for name in changed for target in WATCH_TARGETS.get(name, [])})
+    if not targets:
+        return 0, ''
+    for target in list(targets):
+        sanitizer = f'{target}{SANITIZER_SUFFIX}'
+        if args.sanitize:
+            targets.append(sanitizer)
+        elif autotest.file_exists(sanitizer):
+            os.remove(sanitizer)
+    proc = subprocess.run(['cmake', '--build', '.', '--parallel', '--target'] + targets,
+                          stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, check=False)
+    return proc.returncode, proc.stdout
+
+
+def affected_tests(changed):
+    """
+    Find the tests that depend on any of the changed files.
+
+    Args:
+        changed (set): The changed source files.
+
+    Returns:
+        list: The test names.
+    """
+    return [test for test in impact.all_tests() if changed.intersection(impact.dependencies(test))]
+
+
+def run_tests(tests, args):
+    """
+    Run tests with their output captured, print one line per test and the
+    captured output of failed tests.
+
+    Args:
+        tests (list): The test names.
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        int: The number of failed tests.
+    """
+    failed = 0
+    for test in tests:
+        if test not in autotest.TEST_CASES:
+            continue
+        rc, output = autotest.capture(autotest.run_test, test, args)
+        failed += rc != 0
+        report(test, rc, output)
+    gtests = [test for test in tests if test not in autotest.TEST_CASES]
+    if gtests:
+        results, output = autotest.capture(autotest.run_gtests, gtests, args)
+        for test in gtests:
+            failed += results[test] != 0
+            report(test, results[test], output)
+    return failed
+
+
+def report(test, rc, output):
+    """
+    Print the verdict of a test, and its output if it failed.
+
+    Args:
+        test (str): The test name.
+        rc (int): The return code of the test.
+        output (str): The captured output of the test.
+
+    Returns:
+        None
+    """
+    if rc == 0:
+        autotest.report_info(f'[       OK ] {test}', autotest.GREEN)
+    else:
+        print(output, end='')
+        autotest.report_info(f'[  FAILED  ] {test} rc: {rc}', autotest.RED)
+    return
+
+
+def cycle(changed, args):
+    """
+    Rebuild and retest after a change.
+
+    Args:
+        changed (set): The changed source files.
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        int: The number of failed tests, or the build's return code if the
+            build failed.
+    """
+    start = time.monotonic()
+    autotest.report_info(f'[==========] {time.strftime("%H:%M:%S")} changed: '
+                         f'{" ".join(sorted(changed))}', autotest.BLUE)
+    rc, output = build(changed, args)
+    if rc != 0:
+        print(output, end='')
+        autotest.report_failure('Compile failed.')
+        return rc
+    tests = affected_tests(changed)
+    failed = run_tests(tests, args)
+    summary = (f'[==========] {len(tests) - failed}/{len(tests)} passed '
+               f'in {time.monotonic() - start:.2f}s')
+    autotest.report_info(summary, autotest.RED if failed else autotest.GREEN)
+    return failed
+
+
+def parse_arguments():
+    """
+    Parse command-line arguments.
+
+    Returns:
+        argparse.Namespace: The parsed command-line arguments.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--poll", action="store_true", default=False,
+                        help="Poll for changes instead of using inotify")
+    parser.add_argument("--sanitize", action="store_true", default=False,
+                        help="Also rebuild the sanitizer executables (slower)")
+    parser.add_argument("--debug", action="store_true", default=False,
+                        help="Enable debug mode")
+    return parser.parse_args()
+
+
+def main():
+    """
+    Main entry point of the script.
+
+    Returns:
+        None
+    """
+    args = parse_arguments()
+    args.verbose = True
+
+    autotest.setup(args)
+    if not autotest.file_exists('CMakeCache.txt'):
+        autotest.report_failure('Build directory not configured; run AutoTest_setup.sh first.')
+        sys.exit(1)
+
+    # bring the build up to date with the sources before waiting for edits;
+    # nothing to do (and no sanitizer builds to remove) if none changed
+    changed = sync_sources(autotest.SOURCE_FILES)
+    if changed:
+        cycle(changed, args)
+    autotest.report_info(f'Watching {" ".join(autotest.SOURCE_FILES)} (Ctrl-C to stop)')
+    try:
+        for saved in changes(autotest.PARENT_PROJECT, autotest.SOURCE_FILES, args.poll):
+            changed = sync_sources(saved)
+            if changed:
+                cycle(changed, args)
+    except KeyboardInterrupt:
+        pass
+
+    autotest.cleanup(args)
+    sys.exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,543 @@
+#!/usr/bin/env python
+"""
+AutoTest_WorkQueue.py
+
+Durable work queue for grading many Stack Project submissions on several
+machines. Each submission is split into jobs (setup/build, style, output
+tests, googletests) stored in an SQLite database on a shared directory.
+Workers lease jobs, renew the lease with a heartbeat while they run, and
+record the result; a job whose lease expires (the worker crashed) is handed
+to another worker, up to a retry limit, and a worker that loses a lease
+kills the job and discards its result. The jobs of one submission run one
+at a time, since they share its checkout.
+
+    AutoTest_WorkQueue.py --db Q.sqlite submit SUBMISSION_DIR ...
+    AutoTest_WorkQueue.py --db Q.sqlite worker [--workers N]
+    AutoTest_WorkQueue.py --db Q.sqlite status
+    AutoTest_WorkQueue.py --db Q.sqlite results [--json]
+
+A submission directory is a student checkout with this repository cloned
+into it, as in the GitHub Classroom environment.
+
+Author: Michelle Talley
+Copyright 2024 Michelle Talley University of Central Arkansas
+"""
+import sys
+import os
+import subprocess
+import argparse
+import json
+import multiprocessing
+import signal
+import socket
+import sqlite3
+import threading
+import time
+
+import AutoTest_OutputTest as autotest
+import AutoTest_Impact as impact
+
+
+#--------------------------------------------------------------------------
+# Global variables - modify as needed
+#--------------------------------------------------------------------------
+LEASE_SECONDS = 60
+HEARTBEAT_SECONDS = 15
+MAX_ATTEMPTS = 3
+JOB_TIMEOUT = 600
+IDLE_POLL_SECONDS = 1.0
+# how often a running command checks whether its lease was lost
+LEASE_POLL_SECONDS = 1.0
+
+# job stages in dependency order: later stages wait for 'setup' to pass
+STAGES = ['setup', 'style', 'output', 'gtest']
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    submission TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    rc INTEGER,
+    output TEXT,
+    started REAL,
+    finished REAL,
+    UNIQUE (submission, stage)
+);
+'''
+
+
+#--------------------------------------------------------------------------
+# Broker
+#--------------------------------------------------------------------------
+def connect(db):
+    """
+    Open the queue database, creating the schema if needed.
+
+    Args:
+        db (str): The path to the SQLite database.
+
+    Returns:
+        sqlite3.Connection: The connection (autocommit mode).
+    """
+    conn = sqlite3.connect(db, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA busy_timeout = 30000')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def submit(conn, submissions, stages):
+    """
+    Queue the grading jobs of one or more submissions. Submitting a
+    submission again re-queues its jobs.
+
+    Args:
+        conn (sqlite3.Connection): The queue database.
+        submissions (list): Submission directories.
+        stages (list): The stages to queue.
+
+    Returns:
+        int: The number of jobs queued.
+
+    Raises:
+        ValueError: If stages leaves out setup for a submission that has
+            never had a setup job; its other jobs could never run.
+    """
+    count = 0
+    conn.execute('BEGIN IMMEDIATE')
+    for submission in submissions:
+        submission = os.path.abspath(submission)
+        if 'setup' not in stages and conn.execute(
+                "SELECT 1 FROM jobs WHERE submission = ? AND stage = 'setup'",
+                (submission,)).fetchone() is None:
+            conn.execute('ROLLBACK')
+            raise ValueError(f'{submission} has no setup job; include the setup stage')
+        for stage in stages:
+            conn.execute('INSERT INTO jobs (submission, stage) VALUES (?, ?) '
+                         'ON CONFLICT (submission, stage) DO UPDATE SET '
+                         "state = 'queued', attempts = 0, worker = NULL, lease_until = NULL, "
+                         'rc = NULL, output = NULL, started = NULL, finished = NULL',
+                         (submission, stage))
+            count += 1
+    conn.execute('COMMIT')
+    return count
+
+
+def lease(conn, worker):
+    """
+    Lease the next runnable job. A job is runnable if it is queued, or its
+    lease expired, (for stages after setup) its submission's setup job
+    passed, and no other job of its submission holds a live lease: the
+    stages share the submission's checkout, so they run one at a time.
+    Jobs out of attempts are marked failed.
+
+    Args:
+        conn (sqlite3.Connection): The queue database.
+        worker (str): The worker name.
+
+    Returns:
+        sqlite3.Row: The leased job, or None if nothing is runnable.
+    """
+    now = time.time()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute("UPDATE jobs SET state = 'failed', finished = ?, "
+                     "output = COALESCE(output, '') || 'lease expired too many times' "
+                     "WHERE state = 'leased' AND lease_until < ? AND attempts >= ?",
+                     (now, now, MAX_ATTEMPTS))
+        # a failed (or missing) setup means the remaining stages cannot run
+        conn.execute("UPDATE jobs SET state = 'skipped', finished = ? "
+                     "WHERE state = 'queued' AND stage != 'setup' AND submission IN "
+                     "(SELECT submission FROM jobs WHERE stage = 'setup' AND state = 'failed')",
+                     (now,))
+        conn.execute("UPDATE jobs SET state = 'skipped', finished = ?, output = 'no setup job' "
+                     "WHERE state = 'queued' AND stage != 'setup' AND submission NOT IN "
+                     "(SELECT submission FROM jobs WHERE stage = 'setup')",
+                     (now,))
+        job = conn.execute("SELECT * FROM jobs j WHERE "
+                           "(state = 'queued' OR (state = 'leased' AND lease_until < ?)) AND "
+                           "(stage = 'setup' OR EXISTS (SELECT 1 FROM jobs s WHERE "
+                           "s.submission = j.submission AND s.stage = 'setup' "
+                           "AND s.state = 'passed')) AND "
+                           "NOT EXISTS (SELECT 1 FROM jobs o WHERE o.submission = j.submission "
+                           "AND o.id != j.id AND o.state = 'leased' AND o.lease_until >= ?) "
+                           "ORDER BY attempts, id LIMIT 1", (now, now)).fetchone()
+        if job is not None:
+            conn.execute("UPDATE jobs SET state = 'leased', worker = ?, lease_until = ?, "
+                         "attempts = attempts + 1, started = ? WHERE id = ?",
+                         (worker, now + LEASE_SECONDS, now, job['id']))
+        conn.execute('COMMIT')
+    except sqlite3.Error:
+        conn.execute('ROLLBACK')
+        raise
+    return job
+
+
+def heartbeat(conn, job_id, worker):
+    """
+    Extend the lease of a running job.
+
+    Args:
+        conn (sqlite3.Connection): The queue database.
+        job_id (int): The job id.
+        worker (str): The worker holding the lease.
+
+    Returns:
+        bool: False if the lease was lost to another worker.
+    """
+    cur = conn.execute("UPDATE jobs SET lease_until = ? "
+                       "WHERE id = ? AND worker = ? AND state = 'leased'",
+                       (time.time() + LEASE_SECONDS, job_id, worker))
+    return cur.rowcount == 1
+
+
+def complete(conn, job_id, worker, rc, output):
+    """
+    Record the result of a job, unless the lease was lost meanwhile.
+
+    Args:
+        conn (sqlite3.Connection): The queue database.
+        job_id (int): The job id.
+        worker (str): The worker holding the lease.
+        rc (int): The return code of the job.
+        output (str): The job output.
+
+    Returns:
+        bool: True if the result was recorded.
+    """
+    cur = conn.execute("UPDATE jobs SET state = ?, rc = ?, output = ?, finished = ?, "
+                       "lease_until = NULL WHERE id = ? AND worker = ? AND state = 'leased'",
+                       ('passed' if rc == 0 else 'failed', rc, output, time.time(),
+                        job_id, worker))
+    return cur.rowcount == 1
+
+
+def pending(conn):
+    """
+    Count the jobs that are not finished.
+
+    Args:
+        conn (sqlite3.Connection): The queue database.
+
+    Returns:
+        int: The number of queued or leased jobs.
+    """
+    return conn.execute("SELECT COUNT(*) FROM jobs WHERE state IN ('queued', 'leased')").fetchone()[0]
+
+
+#--------------------------------------------------------------------------
+# Worker
+#--------------------------------------------------------------------------
+def stage_commands(stage):
+    """
+    The commands that run a job stage, relative to the submission directory,
+    mirroring AutoTest_all.sh and the classroom configuration.
+
+    Args:
+        stage (str): The job stage.
+
+    Returns:
+        list: (command, working directory relative to the submission) pairs.
+    """
+    repo = autotest.PROJECT
+    if stage == 'setup':
+        return [('./AutoTest_setup.sh', repo)]
+    if stage == 'style':
+        return [(f'./AutoTest_Style.sh {repo} ' + ' '.join(autotest.SOURCE_FILES), repo)]
+    if stage == 'output':
+        return [(f'./{repo}/AutoTest_OutputTest.py -t {test}', '.') for test in autotest.TEST_CASES]
+    if stage == 'gtest':
+        tests = impact.gtest_cases(os.path.join(repo, autotest.GTEST_SOURCE_FILE))
+        return [(f'./{repo}/AutoTest_gtest.sh {test}', '.') for test in tests]
+    raise ValueError(f'unknown stage: {stage}')
+
+
+def run_command(cmd, workdir, lost=None):
+    """
+    Run one command of a job. The command is killed, with the processes it
+    started, when it times out or the lease of its job is lost.
+
+    Args:
+        cmd (str): The shell command.
+        workdir (str): The working directory of the command.
+        lost (threading.Event, optional): Set when the lease was lost.
+
+    Returns:
+        tuple: (return code, output)
+    """
+    proc = subprocess.Popen(cmd, shell=True, cwd=workdir, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT, start_new_session=True)
+    deadline = time.time() + JOB_TIMEOUT
+    while True:
+        try:
+            output, _ = proc.communicate(timeout=LEASE_POLL_SECONDS)
+            return proc.returncode, output.decode('utf-8', errors='replace')
+        except subprocess.TimeoutExpired:
+            if lost is not None and lost.is_set():
+                rc, output = 1, 'lease lost'
+            elif time.time() > deadline:
+                rc, output = 124, f'timed out after {JOB_TIMEOUT} seconds'
+            else:
+                continue
+        # the command runs in its own session: kill the shell and its children
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        proc.communicate()
+        return rc, output
+
+
+def run_job(job, lost=None):
+    """
+    Run every command of a job in its submission directory, stopping early
+    if the lease of the job is lost.
+
+    Args:
+        job (sqlite3.Row): The job.
+        lost (threading.Event, optional): Set when the lease was lost.
+
+    Returns:
+        tuple: (return code, JSON summary of each command's result)
+    """
+    cwd = os.getcwd()
+    os.chdir(job['submission'])
+    try:
+        results = []
+        for cmd, workdir in stage_commands(job['stage']):
+            rc, output = run_command(cmd, workdir, lost)
+            results.append({'command': cmd, 'rc': rc, 'output': output})
+            if lost is not None and lost.is_set():
+                break
+    except (OSError, ValueError) as err:
+        return 1, json.dumps([{'command': job['stage'], 'rc': 1, 'output': str(err)}])
+    finally:
+        os.chdir(cwd)
+    rc = next((r['rc'] for r in results if r['rc'] != 0), 0)
+    return rc, json.dumps(results)
+
+
+def worker(db, name, drain, verbose):
+    """
+    Lease and run jobs until the queue is drained (or forever).
+
+    Args:
+        db (str): The path to the queue database.
+        name (str): The worker name.
+        drain (bool): Exit when no jobs are pending.
+        verbose (bool): Report each job.
+
+    Returns:
+        int: The number of jobs completed.
+    """
+    conn = connect(db)
+    done = 0
+    while True:
+        job = lease(conn, name)
+        if job is None:
+            if drain and pending(conn) == 0:
+                return done
+            time.sleep(IDLE_POLL_SECONDS)
+            continue
+
+        # renew the lease from a separate connection while the job runs; a
+        # lost lease stops the job and its result is discarded
+        stop = threading.Event()
+        lost = threading.Event()
+        def beat(job_id=job['id']):
+            renewed = time.time()
+            beat_conn = None
+            try:
+                while not stop.wait(HEARTBEAT_SECONDS):
+                    try:
+                        if beat_conn is None:
+                            beat_conn = connect(db)
+                        if not heartbeat(beat_conn, job_id, name):
+                            lost.set()
+                            return
+                        renewed = time.time()
+                    except sqlite3.Error:
+                        # retry at the next beat, unless the lease ran out meanwhile
+                        if time.time() - renewed >= LEASE_SECONDS:
+                            lost.set()
+                            return
+            finally:
+                if beat_conn is not None:
+                    beat_conn.close()
+        thread = threading.Thread(target=beat, daemon=True)
+        thread.start()
+        try:
+            rc, output = run_job(job, lost)
+        finally:
+            stop.set()
+            thread.join()
+        recorded = not lost.is_set() and complete(conn, job['id'], name, rc, output)
+        done += 1
+        if verbose:
+            msg = f'{name}: {job["stage"]} {job["submission"]} rc: {rc}'
+            if not recorded:
+                autotest.report_info(f'{msg} (lease lost, result discarded)', autotest.RED)
+            elif rc == 0:
+                autotest.report_info(msg, autotest.GREEN)
+            else:
+                autotest.report_info(msg, autotest.RED)
+
+
+def run_workers(args):
+    """
+    Run one or more local worker processes.
+
+    Args:
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        int: 0 if every worker exited cleanly.
+    """
+    base = f'{socket.gethostname()}-{os.getpid()}'
+    if args.workers == 1:
+        worker(args.db, base, args.drain, args.verbose)
+        return 0
+    procs = [multiprocessing.Process(target=worker,
+                                     args=(args.db, f'{base}-{i}', args.drain, args.verbose))
+             for i in range(args.workers)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    return 0 if all(proc.exitcode == 0 for proc in procs) else 1
+
+
+#--------------------------------------------------------------------------
+# Reporting
+#--------------------------------------------------------------------------
+def aggregate(conn):
+    """
+    Collect the job results per submission.
+
+    Args:
+        conn (sqlite3.Connection): The queue database.
+
+    Returns:
+        dict: Maps each submission to {stage: {'state', 'rc', 'attempts',
+            'results'}}.
+    """
+    summary = {}
+    for job in conn.execute('SELECT * FROM jobs ORDER BY submission, id'):
+        results = json.loads(job['output']) if job['output'] and job['output'].startswith('[') else []
+        summary.setdefault(job['submission'], {})[job['stage']] = {
+            'state': job['state'], 'rc': job['rc'], 'attempts': job['attempts'],
+            'results': [{'command': r['command'], 'rc': r['rc']} for r in results]}
+    return summary
+
+
+def status(args):
+    """
+    Print the number of jobs in each state.
+
+    Args:
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        int: 0
+    """
+    conn = connect(args.db)
+    for row in conn.execute('SELECT state, COUNT(*) AS n FROM jobs GROUP BY state ORDER BY state'):
+        autotest.report_info(f'{row["state"]:>8}: {row["n"]}')
+    return 0
+
+
+def results(args):
+    """
+    Print the aggregated results of every submission.
+
+    Args:
+        args (argparse.Namespace): The command-line arguments.
+
+    Returns:
+        int: 0 if every finished job passed, 1 otherwise.
+    """
+    summary = aggregate(connect(args.db))
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        for submission, stages in summary.items():
+            autotest.report_info(submission, autotest.BLUE)
+            for stage in STAGES:
+                if stage not in stages:
+                    continue
+                job = stages[stage]
+                passed = sum(1 for r in job['results'] if r['rc'] == 0)
+                color = autotest.GREEN if job['state'] == 'passed' else autotest.RED
+                autotest.report_info(f'    {stage:<6} {job["state"]:<7} '
+                                     f'{passed}/{len(job["results"])} commands passed, '
+                                     f'{job["attempts"]} attempt(s)', color)
+    failed = any(job['state'] in ('failed', 'skipped')
+                 for stages in summary.values() for job in stages.values())
+    return 1 if failed else 0
+
+
+def parse_arguments():
+    """
+    Parse command-line arguments.
+
+    Returns:
+        argparse.Namespace: The parsed command-line arguments.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", type=str, required=True,
+                        help="Queue database (on a directory shared by all nodes)")
+    parser.add_argument("-q", "--quiet", action="store_true", default=False,
+                        help="Enable quiet mode")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    submit_parser = subparsers.add_parser('submit', help="Queue submissions for grading")
+    submit_parser.add_argument("submissions", nargs='+', help="Submission directories")
+    submit_parser.add_argument("--stages", nargs='+', choices=STAGES, default=STAGES,
+                               help="Stages to queue")
+
+    worker_parser = subparsers.add_parser('worker', help="Run grading workers")
+    worker_parser.add_argument("-w", "--workers", type=int, default=1,
+                               help="Number of local worker processes")
+    worker_parser.add_argument("--drain", action="store_true", default=False,
+                               help="Exit when the queue is empty")
+
+    subparsers.add_parser('status', help="Show job counts by state")
+
+    results_parser = subparsers.add_parser('results', help="Show aggregated results")
+    results_parser.add_argument("--json", action="store_true", default=False,
+                                help="Print the results as JSON")
+    return parser.parse_args()
+
+
+def main():
+    """
+    Main entry point of the script.
+
+    Returns:
+        None
+    """
+    args = parse_arguments()
+    args.verbose = not args.quiet
+
+    if args.command == 'submit':
+        try:
+            count = submit(connect(args.db), args.submissions, args.stages)
+            autotest.report_info(f'Queued {count} jobs')
+            rc = 0
+        except ValueError as err:
+            autotest.report_failure(str(err))
+            rc = 1
+    elif args.command == 'worker':
+        rc = run_workers(args)
+    elif args.command == 'status':
+        rc = status(args)
+    else:
+        rc = results(args)
+    sys.exit(rc)
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,12 @@ echo " To be consistent with the grading environment, assume we are starting out
 echo " in the source directory (i.e., the parent of the AutoTest directory)."
 echo " You will get a cd error if you execute directly from the AutoTest directory."
 echo "#############################################################################"
+# If an AutoTest daemon is running (see AutoTest_Daemon.py), let it grade the
+# checkout using its warm build tree and fixtures instead of starting from scratch.
+if [ -n "$AUTOTEST_SOCKET" ] && [ -S "$AUTOTEST_SOCKET" ]; then
+    ./$repo/AutoTest_Daemon.py --socket "$AUTOTEST_SOCKET" grade .
+    exit $?
+fi
 cd $repo
 echo
 echo "#################### START: AutoTest Results #####################"
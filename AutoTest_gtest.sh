@@ -63,6 +63,19 @@ if [ $rc -ne 0 ]; then
   printf "${red}[==========]${reset}\n"
   printf "${red}[  FAILED  ] ${test_name}: ${reason}${reset}\n"
   printf "${red}[==========]${reset}\n" 
+
+  # On a crash, rerun the test under the sanitizer build to show where it crashed
+  sanitizer_executable="${test_executable}_asan"
+  build_dir=$(dirname "$test_executable")
+  if [ $rc -gt 128 ] && [ -f "${build_dir}/CMakeCache.txt" ]; then
+    # not part of the default build; build it (or bring it up to date) now
+    cmake --build "$build_dir" --target "$(basename "$sanitizer_executable")" > /dev/null 2>&1
+  fi
+  if [ $rc -gt 128 ] && [ -x "$sanitizer_executable" ]; then
+    printf "${red}[SANITIZER ] ${sanitizer_executable} --gtest_filter=${test_name}${reset}\n"
+    ASAN_OPTIONS=detect_leaks=0:handle_abort=1 UBSAN_OPTIONS=print_stacktrace=1:halt_on_error=1 \
+      $sanitizer_executable --gtest_filter=$test_name
+  fi
 fi
 
 exit $rc
\ No newline at end of file
@@ -0,0 +1,134 @@
+/**
+* ---------------------------------------------------------------------
+* @copyright
+* Copyright 2024 Michelle Talley University of Central Arkansas
+*
+* @author: Michelle Talley
+* @course: Data Structures (CSCI 2320)
+*
+* @file AutoTest_perf.cpp
+* @brief Bulk Stack and Queue workloads for AutoTest_Perf.py. Built once
+*        with the student's Stack.h/Queue.h (AutoTest_perf) and once with
+*        the reference headers (AutoTest_perf_reference).
+*
+* Usage: AutoTest_perf <workload> <n>
+-----------------------------------------------------------------------
+*/
+
+#include <cstdlib>
+#include <functional>
+#include <iostream>
+#include <map>
+#include <string>
+
+#include "Stack.h"
+#include "Queue.h"
+
+// a movie-title sized string, so copies are not free
+static std::string title(long i)
+{
+    return "Performance Test Movie " + std::to_string(i) + ": The Sequel";
+}
+
+// push n values, then read and pop them all
+static long stack_bulk(long n)
+{
+    Stack<long> s;
+    long checksum = 0;
+    for (long i = 0; i < n; i++)
+        s.push(i);
+    while (!s.empty())
+    {
+        checksum += s.top();
+        s.pop();
+    }
+    return checksum;
+}
+
+// enqueue n values, then read and dequeue them all
+static long queue_bulk(long n)
+{
+    Queue<long> q;
+    long checksum = 0;
+    for (long i = 0; i < n; i++)
+        q.enqueue(i);
+    while (!q.empty())
+    {
+        checksum += q.front();
+        q.dequeue();
+    }
+    return checksum;
+}
+
+// keep about 1000 titles on the stack while pushing and popping n
+static long stack_steady(long n)
+{
+    Stack<std::string> s;
+    long checksum = 0;
+    for (long i = 0; i < n; i++)
+    {
+        s.push(title(i));
+        if (s.size() > 1000)
+        {
+            checksum += static_cast<long>(s.top().size());
+            s.pop();
+        }
+    }
+    return checksum + s.size();
+}
+
+// keep about 1000 titles in the queue while enqueueing and dequeueing n
+static long queue_steady(long n)
+{
+    Queue<std::string> q;
+    long checksum = 0;
+    for (long i = 0; i < n; i++)
+    {
+        q.enqueue(title(i));
+        if (q.size() > 1000)
+        {
+            checksum += static_cast<long>(q.front().size());
+            q.dequeue();
+        }
+    }
+    return checksum + q.size();
+}
+
+// copy a stack and a queue of n titles
+static long copy(long n)
+{
+    Stack<std::string> s;
+    Queue<std::string> q;
+    for (long i = 0; i < n; i++)
+    {
+        s.push(title(i));
+        q.enqueue(title(i));
+    }
+    Stack<std::string> s2(s);
+    Queue<std::string> q2(q);
+    return s2.size() + q2.size();
+}
+
+int main(int argc, char *argv[])
+{
+    const std::map<std::string, std::function<long(long)>> workloads = {
+        {"stack_bulk", stack_bulk},
+        {"queue_bulk", queue_bulk},
+        {"stack_steady", stack_steady},
+        {"queue_steady", queue_steady},
+        {"copy", copy},
+    };
+
+    if (argc != 3 || workloads.count(argv[1]) == 0)
+    {
+        std::cerr << "Usage: " << argv[0] << " <workload> <n>\nWorkloads:";
+        for (const auto &workload : workloads)
+            std::cerr << " " << workload.first;
+        std::cerr << std::endl;
+        return 2;
+    }
+
+    // the checksum keeps the compiler from optimizing the work away
+    std::cout << workloads.at(argv[1])(std::atol(argv[2])) << std::endl;
+    return 0;
+}
@@ -0,0 +1,95 @@
+/**
+* ---------------------------------------------------------------------
+* @copyright
+* Copyright 2024 Michelle Talley University of Central Arkansas
+*
+* @author: Michelle Talley
+* @course: Data Structures (CSCI 2320)
+*
+* @file Queue.h
+* @brief Reference Queue used as the performance baseline (AutoTest_Perf.py).
+*        A thin wrapper over std::deque with the interface the tests use.
+-----------------------------------------------------------------------
+*/
+#pragma once
+
+#include <deque>
+#include <fstream>
+#include <iostream>
+#include <sstream>
+#include <stdexcept>
+#include <string>
+#include <type_traits>
+
+template <typename T>
+class Queue
+{
+public:
+    Queue() = default;
+    Queue(const Queue &other) = default;
+
+    bool empty() const { return data_.empty(); }
+    int size() const { return static_cast<int>(data_.size()); }
+
+    void enqueue(const T &value) { data_.push_back(value); }
+
+    void dequeue()
+    {
+        if (data_.empty())
+            throw std::out_of_range("Queue::dequeue: queue is empty");
+        data_.pop_front();
+    }
+
+    T &front()
+    {
+        if (data_.empty())
+            throw std::out_of_range("Queue::front: queue is empty");
+        return data_.front();
+    }
+
+    // elements from front to back, separated by spaces
+    std::string toString() const
+    {
+        std::ostringstream os;
+        for (const auto &value : data_)
+            os << value << " ";
+        return os.str();
+    }
+
+    // one element per line, front first
+    void print() const
+    {
+        for (const auto &value : data_)
+            std::cout << value << "\n";
+    }
+
+    // one element per line, front first
+    void save(const std::string &filename) const
+    {
+        std::ofstream file(filename);
+        for (const auto &value : data_)
+            file << value << "\n";
+    }
+
+    // reads a file written by save(); the first line becomes the front
+    void restore(const std::string &filename)
+    {
+        std::ifstream file(filename);
+        std::string line;
+        data_.clear();
+        while (std::getline(file, line))
+            data_.push_back(parse(line));
+    }
+
+private:
+    static T parse(const std::string &line)
+    {
+        if constexpr (std::is_same_v<T, std::string>)
+            return line;
+        T value{};
+        std::istringstream(line) >> value;
+        return value;
+    }
+
+    std::deque<T> data_;
+};
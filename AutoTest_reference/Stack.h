@@ -0,0 +1,96 @@
+/**
+* ---------------------------------------------------------------------
+* @copyright
+* Copyright 2024 Michelle Talley University of Central Arkansas
+*
+* @author: Michelle Talley
+* @course: Data Structures (CSCI 2320)
+*
+* @file Stack.h
+* @brief Reference Stack used as the performance baseline (AutoTest_Perf.py).
+*        A thin wrapper over std::vector with the interface the tests use.
+-----------------------------------------------------------------------
+*/
+#pragma once
+
+#include <fstream>
+#include <iostream>
+#include <sstream>
+#include <stdexcept>
+#include <string>
+#include <type_traits>
+#include <vector>
+
+template <typename T>
+class Stack
+{
+public:
+    Stack() = default;
+    Stack(const Stack &other) = default;
+
+    bool empty() const { return data_.empty(); }
+    int size() const { return static_cast<int>(data_.size()); }
+
+    void push(const T &value) { data_.push_back(value); }
+
+    void pop()
+    {
+        if (data_.empty())
+            throw std::out_of_range("Stack::pop: stack is empty");
+        data_.pop_back();
+    }
+
+    T &top()
+    {
+        if (data_.empty())
+            throw std::out_of_range("Stack::top: stack is empty");
+        return data_.back();
+    }
+
+    // elements from top to bottom, separated by spaces
+    std::string toString() const
+    {
+        std::ostringstream os;
+        for (auto it = data_.rbegin(); it != data_.rend(); ++it)
+            os << *it << " ";
+        return os.str();
+    }
+
+    // one element per line, top first
+    void print() const
+    {
+        for (auto it = data_.rbegin(); it != data_.rend(); ++it)
+            std::cout << *it << "\n";
+    }
+
+    // one element per line, top first
+    void save(const std::string &filename) const
+    {
+        std::ofstream file(filename);
+        for (auto it = data_.rbegin(); it != data_.rend(); ++it)
+            file << *it << "\n";
+    }
+
+    // reads a file written by save(); the first line becomes the top
+    void restore(const std::string &filename)
+    {
+        std::ifstream file(filename);
+        std::vector<T> lines;
+        std::string line;
+        while (std::getline(file, line))
+            lines.push_back(parse(line));
+        data_.assign(lines.rbegin(), lines.rend());
+    }
+
+private:
+    static T parse(const std::string &line)
+    {
+        if constexpr (std::is_same_v<T, std::string>)
+            return line;
+        T value{};
+        std::istringstream(line) >> value;
+        return value;
+    }
+
+    std::vector<T> data_;
+};
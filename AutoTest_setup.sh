@@ -42,7 +42,8 @@ if [ -d "build" ]; then
     rm -rf build
 fi
 cmake -S . -B build
-cmake --build build
+# builds main and the gtests concurrently (the sanitizer variants are built on demand)
+cmake --build build --parallel
 rc=$?
 if [ $rc -ne 0 ]; then
     printf "${red}[==========]${reset}\n"